@@ -0,0 +1,106 @@
+"""Measures the memory taken by a large virtual file system.
+
+Builds a tree of storage units with utils.storage_system_parser, from root.json-style input: a list of dictionaries
+with a name and contents, Directories being those whose contents are a list. The input is made up, or read from a
+file, before anything is measured, so only the storage units are.
+
+The tree is built twice: once untraced, which is what the build time is taken from, and once more while tracemalloc
+runs, after which a snapshot of the built tree is taken. tracemalloc slows building down several times over, and only
+sees what is allocated while it runs.
+
+Run it from the directory main.py is run from, e.g.
+	python benchmarks/vfs_memory.py --nodes 1000000
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.storage_system.directory import Directory
+from utils.storage_system_parser import parse_root
+
+
+def make_tree(nodes, subdirectories, files, contents):
+	"""Returns root.json-style input for a tree of nodes storage units, filled breadth first.
+
+	Every Directory gets the given number of Files, then of sub Directories, until there are enough storage units.
+	"""
+
+	root = []
+	to_fill = deque([root])
+	made = 0
+	while made < nodes:
+		directory = to_fill.popleft()
+		for index in range(files):
+			if made == nodes: break
+			directory.append({'name': f'file{index}.txt', 'contents': contents})
+			made += 1
+		for index in range(subdirectories):
+			if made == nodes: break
+			subdirectory = []
+			directory.append({'name': f'dir{index}', 'contents': subdirectory})
+			to_fill.append(subdirectory)
+			made += 1
+
+	return root
+
+
+def count_nodes(tree):
+	count = 0
+	stack = [tree]
+	while stack:
+		for su in stack.pop():
+			count += 1
+			if isinstance(su['contents'], list): stack.append(su['contents'])
+	return count
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description='Measure the memory taken by a virtual file system')
+	parser.add_argument('--nodes', type=int, default=1000000, help='number of storage units to make')
+	parser.add_argument('--subdirectories', type=int, default=4, help='sub Directories in every Directory')
+	parser.add_argument('--files', type=int, default=12, help='Files in every Directory')
+	parser.add_argument('--contents', default='', help='contents of every File')
+	parser.add_argument('--root', default=None, help='root.json-style file to build instead of a made up tree')
+	return parser.parse_args()
+
+
+def main():
+	args = parse_args()
+	if args.root:
+		with open(args.root, 'r') as f:
+			tree = json.load(f)
+	else:
+		tree = make_tree(args.nodes, args.subdirectories, args.files, args.contents)
+	nodes = count_nodes(tree)
+
+	start = time.perf_counter()
+	root = parse_root(tree)
+	elapsed = time.perf_counter() - start
+	print(f'Built {nodes} storage units in {elapsed:.2f}s ({Directory.__name__} and File, {len(root.get_contents())} at the root).')
+	del root
+	gc.collect()
+
+	tracemalloc.start()
+	root = parse_root(tree)
+	gc.collect()
+	snapshot = tracemalloc.take_snapshot()
+	tracemalloc.stop()
+
+	size = sum(statistic.size for statistic in snapshot.statistics('filename'))
+	print(f'Memory: {size / 2 ** 20:.1f} MiB, {size / nodes:.0f} bytes per storage unit.')
+	print('Largest allocations:')
+	for statistic in snapshot.statistics('lineno')[:5]:
+		print(f'\t{statistic}')
+
+
+if __name__ == '__main__':
+	main()
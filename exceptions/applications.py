@@ -12,4 +12,4 @@ class TerminalCommandError(Exception):
         super().__init__(self.message)
 
     def __str__(self):
-        return f'{self.name} -> {self.message}'
+        return f'{self.command} -> {self.message}'
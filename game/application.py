@@ -1,7 +1,10 @@
 import pygame
+import time
 
 from custom_logging.logging import get_logger
 from game.constants import *
+from game.event_queue import EventQueue
+from utils.profiler import profiler
 
 
 logger = get_logger('game')
@@ -10,6 +13,9 @@ logger = get_logger('game')
 class Application(object):
 	def __init__(self, os, opened_by, memory):
 		self.os = os
+		# Whether current_dir is counted in the open Directories of the OS. It starts being once the OS has registered
+		# the application, see hold_current_dir(), and stops being when quitting.
+		self.holds_current_dir = False
 		self.current_dir = os.root
 		self.opened_by = opened_by
 		self.title = "Application"
@@ -20,19 +26,53 @@ class Application(object):
 		self.titlebar = True
 		self.child_app = None
 
-		self.event_queue = []
+		self.event_queue = EventQueue()
 		self.current_event = None
+		# Most events handled per frame. The rest wait for the next frame.
+		self.event_budget = 256
 
 		self.timer = 0
 		self.timer_running = False
 
+		# The window surface keeps the last drawn content, which is only redrawn after invalidate().
+		self.invalidated = True
+		self.cursor_backing = None
+		self.next_blink = None
+
 		logger.debug(f'Started a {self.__class__.__name__} Instance requested by OS with username {opened_by.username} ({opened_by.system.IP}).')
 
+	@property
+	def current_dir(self):
+		return self._current_dir
+
+	@current_dir.setter
+	def current_dir(self, directory):
+		if self.holds_current_dir:
+			if getattr(self, '_current_dir', None): self.os.directory_closed(self._current_dir)
+			if directory: self.os.directory_opened(directory)
+		self._current_dir = directory
+
+	def hold_current_dir(self):
+		"""Starts counting current_dir in the open Directories of the OS, once the application is running."""
+
+		if self.holds_current_dir: return
+		self.holds_current_dir = True
+		if self.current_dir: self.os.directory_opened(self.current_dir)
+
 	async def event_handler(self):
-		if len(self.event_queue) < 1:
-			self.current_event = None
-			return
-		self.current_event = self.event_queue.pop(0)
+		"""Handles the queued events one at a time with handle_event(), up to event_budget of them."""
+
+		handled = 0
+		while self.event_queue and handled < self.event_budget:
+			self.current_event = self.event_queue.popleft()
+			await self.handle_event()
+			handled += 1
+		self.current_event = None
+		if self.event_queue: self.os.system.scheduler.wake()
+
+	async def handle_event(self):
+		"""Handles self.current_event. Applications extend this rather than event_handler()."""
+
 		if not self.child_app:
 			if self.os.modifiers["alt"] and self.current_event.type == pygame.KEYUP and self.current_event.key == pygame.K_F3:
 				self.quit()
@@ -56,21 +96,73 @@ class Application(object):
 			if self.is_being_moved and self.current_event.type == pygame.MOUSEBUTTONUP and self.current_event.button==1:
 				self.is_being_moved = False
 		else:
-			self.child_app.event_queue += [self.current_event]
+			self.child_app.event_queue.append(self.current_event)
 
 	async def graphics_handler(self):
 		self.os.system.graphics.fill_application_window(self.surface, self.bg_colour)
 
+	async def animate(self):
+		"""Called every frame after the retained content, for things that change without invalidating it."""
+		pass
+
+	def invalidate(self):
+		"""Marks the window content as outdated so it gets redrawn on the next frame."""
+		self.invalidated = True
+
+	async def handle_events(self):
+		with profiler.measure(self, 'event_handler'):
+			await self.event_handler()
+
+	async def redraw(self):
+		if self.invalidated:
+			self.invalidated = False
+			self.cursor_backing = None
+			with profiler.measure(self, 'graphics_handler'):
+				await self.graphics_handler()
+		with profiler.measure(self, 'animate'):
+			await self.animate()
+
+	def cursor_alpha(self):
+		"""Returns the alpha of the blinking cursor right now, making sure a frame runs when it next turns on or off."""
+
+		now = time.perf_counter()
+		blinks, elapsed = divmod(now, cursor_blink_interval)
+		# Only the next blink is scheduled, so while idle there is a frame per blink rather than one per frame time.
+		next_blink = now - elapsed + cursor_blink_interval
+		if next_blink != self.next_blink:
+			self.os.system.scheduler.schedule(next_blink - now)
+			self.next_blink = next_blink
+		return 0 if blinks % 2 else 155
+
+	def draw_cursor(self, cursor, rect):
+		"""Draws the cursor over the retained content, restoring whatever the previous cursor covered first."""
+
+		if self.cursor_backing:
+			backing, backing_rect = self.cursor_backing
+			self.surface.fill((0, 0, 0, 0), backing_rect)
+			self.surface.blit(backing, backing_rect, special_flags=pygame.BLEND_RGBA_MAX)
+
+		covered = rect.clip(self.surface.get_rect())
+		if not covered.width or not covered.height:
+			self.cursor_backing = None
+			return
+		backing = pygame.Surface(covered.size, pygame.SRCALPHA)
+		backing.fill((0, 0, 0, 0))
+		backing.blit(self.surface, (0, 0), covered, special_flags=pygame.BLEND_RGBA_MAX)
+		self.cursor_backing = (backing, covered)
+		self.surface.blit(cursor, rect)
+
 	async def run(self):
-		if self.timer_running:
-			self.timer += self.os.system.graphics.conn_pygame_graphics.dt
-			if self.timer >= double_click_window:
-				self.timer_running = False
-		await self.event_handler()
-		if self.child_app:
-			await self.child_app.run() 
-		else:
-			await self.graphics_handler()
+		with profiler.measure(self, 'run'):
+			if self.timer_running:
+				self.timer += self.os.system.graphics.conn_pygame_graphics.dt
+				if self.timer >= double_click_window:
+					self.timer_running = False
+			await self.handle_events()
+			if self.child_app:
+				await self.child_app.run() 
+			else:
+				await self.redraw()
 
 
 	async def idle(self):
@@ -81,11 +173,15 @@ class Application(object):
 
 	def quit(self):
 		logger.debug(f'Quitting {self.__class__.__name__} Instance.')
+		if self.holds_current_dir:
+			self.os.directory_closed(self.current_dir)
+			self.holds_current_dir = False
 		if isinstance(self.master_app, MasterApplication):
 			self.os.system.graphics.conn_pygame_graphics.pop_surface(self.surface)
 			self.master_app.application_queue.remove(self)
 		else:
 			self.master_app.child_app = None
+			self.master_app.invalidate()
 		self.os.applications[self.__class__.__name__.upper()]['instances'].remove(self)
 
 class MasterApplication(Application):
@@ -96,7 +192,7 @@ class MasterApplication(Application):
 		self.opened_by = opened_by
 		self.memory = memory
 		self.application_queue = []
-		self.event_queue = []
+		self.event_queue = EventQueue()
 		self.current_event = None
 		self.starting_size = self.os.system.graphics.conn_pygame_graphics.win.get_size()
 		self.bg_colour = None
@@ -104,10 +200,8 @@ class MasterApplication(Application):
 
 		logger.debug(f'Started a {self.__class__.__name__} Instance requested by OS with username {opened_by.username} ({opened_by.system.IP}).')
 	
-	async def event_handler(self):
-		if len(self.event_queue) < 1:
-			self.current_event = None
-			return
+	async def handle_event(self):
+		pass
 
 	async def graphics_handler(self):
 		pass
@@ -116,12 +210,13 @@ class MasterApplication(Application):
 		pass
 
 	async def run(self):
-		await self.event_handler()
-		await self.graphics_handler()
-		if self.application_queue:
-			await self.application_queue[0].run()
-			for app in self.application_queue[1:]:
-				await app.idle()
+		with profiler.measure(self, 'run'):
+			await self.handle_events()
+			await self.redraw()
+			if self.application_queue:
+				await self.application_queue[0].run()
+				for app in self.application_queue[1:]:
+					await app.idle()
 
 class TerminalApplication(Application):
 	def __init__(self, os, opened_by, memory):
@@ -138,22 +233,24 @@ class TerminalApplication(Application):
 		self.hideinput = False
 		logger.debug(f'Started a {self.__class__.__name__} Instance requested by OS with username {opened_by.username} ({opened_by.system.IP}).')
 
-	async def event_handler(self):
+	async def handle_event(self):
 		#logger.warn("Calling super")
-		await super().event_handler()
+		await super().handle_event()
 	
 	async def graphics_handler(self):
 		await super().graphics_handler()
 
 	def update_content(self, string, new=False):
 		self.content.update_string(string, new=new)
+		self.invalidate()
 
 	async def idle(self):
 		pass
 
 	async def run(self):
-		if not self.child_app:
-			await self.event_handler()
-			await self.graphics_handler()
-		else:
-			await self.child_app.run()
\ No newline at end of file
+		with profiler.measure(self, 'run'):
+			if not self.child_app:
+				await self.handle_events()
+				await self.redraw()
+			else:
+				await self.child_app.run()
\ No newline at end of file
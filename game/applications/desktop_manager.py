@@ -21,13 +21,7 @@ class DesktopManager(MasterApplication):
 		self.icon_background_render = Surface((100,100), (0,0))
 		self.icon_background_render.fill((27, 63, 181, 100))
 
-	async def event_handler(self):
-		if len(self.event_queue) < 1:
-			self.current_event = None
-			return
-			
-		self.current_event = self.event_queue.pop(0)
-
+	async def handle_event(self):
 		if self.current_event.type==pygame.MOUSEBUTTONDOWN and self.current_event.button==1:
 			if self.application_queue:
 				popindex = None
@@ -44,6 +38,7 @@ class DesktopManager(MasterApplication):
 
 			predicate = self.current_event.pos[0] <= (len(self.icons)//self.icon_limit_row)*self.icon_size[0] and self.current_event.pos[1] <= self.icon_limit_row*self.icon_size[1] or \
 				(len(self.icons)//self.icon_limit_row)*self.icon_size[0] < self.current_event.pos[0] <= math.ceil(len(self.icons)/self.icon_limit_row)*self.icon_size[0] and self.current_event.pos[1] <= (len(self.icons) % self.icon_limit_row)*self.icon_size[1]
+			self.invalidate()
 			if predicate:
 				selected_x = self.current_event.pos[0] // self.icon_size[0] 
 				selected_y = self.current_event.pos[1] // self.icon_size[1] 
@@ -56,12 +51,11 @@ class DesktopManager(MasterApplication):
 			for i in self.selected:
 				self.icons[i].open(self)
 			self.selected = set()
+			self.invalidate()
 			return
 
 		if self.application_queue:
-			self.application_queue[0].event_queue += [self.current_event]
-
-		await self.event_handler()
+			self.application_queue[0].event_queue.append(self.current_event)
 
 	async def graphics_handler(self):
 		#TODO: Remove once desktop images are a thing
@@ -4,6 +4,7 @@ from custom_logging.logging import get_logger
 from game.application import Application
 from game.constants import titlebar_height
 from game.storage_system.file import File
+from game.icon_grid import IconGrid
 
 
 logger = get_logger('game')
@@ -21,25 +22,39 @@ class AuthenticFile(Application):
 		self.file_icon_path = '/images/icons/file_icon.png'
 		self.folder_icon_path = '/images/icons/folder_icon.png'
 
-		self.storage_units = dict.fromkeys(self.current_dir.get_contents(), False)
+		self.storage_units = list(self.current_dir.get_contents())
+		# Generation of current_dir when storage_units were taken from it.
+		self.generation = self.current_dir.generation
+		self.selected = set()
 
 		self.icon_dimensions = [64, 64]
 		self.space = [10, 8]
+		self.grid = None
 
 		self.scroll = 0
 		self.ctrl = False
 
+	def get_grid(self):
+		"""Returns the icon layout of the window, which is shared by rendering and hit-testing."""
+
+		if not self.grid:
+			self.grid = IconGrid(self.surface.get_width(), self.surface.get_height() - titlebar_height, self.icon_dimensions, self.space)
+		return self.grid
+
 	async def run(self):
-		logger.warn(self.timer_running)
+		# The contents only need to be looked at again when the directory changed, so idle frames cost the same
+		# however many storage units it has.
+		if self.current_dir.generation != self.generation:
+			self.storage_units = list(self.current_dir.get_contents())
+			self.generation = self.current_dir.generation
+			self.selected.intersection_update(self.storage_units)
+			self.invalidate()
 		await super().run()
-		updated = self.current_dir.get_contents()
-		for unit in updated:
-			if unit not in self.storage_units:
-				self.storage_units[unit] = False
 
-	async def event_handler(self):
-		await super().event_handler()
-		if not self.current_event: return
+	async def handle_event(self):
+		await super().handle_event()
+		# Scrolling, selecting and changing directory all come from these.
+		if self.current_event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN): self.invalidate()
 
 		if self.current_event.type == pygame.KEYDOWN:
 			if self.current_event.key == pygame.K_DOWN:
@@ -49,58 +64,49 @@ class AuthenticFile(Application):
 
 			if self.current_event.key == pygame.K_BACKSPACE:
 				if self.current_dir.get_parent(): 
-					self.current_dir = self.current_dir.get_parent()
-					self.scroll = 0
-					self.storage_units = dict.fromkeys(self.current_dir.get_contents(), False)
+					self.change_dir(self.current_dir.get_parent())
 
-			limit = self.surface.get_width() // (self.icon_dimensions[0] + 2 * (self.space[0]))
-			new_surface_height = ((self.icon_dimensions[1] + (3 * self.space[1])) * ((len(self.storage_units.keys()) // limit) + 2))
-			self.scroll = min(max(self.scroll, 0), 0 if new_surface_height < self.surface.get_height() - titlebar_height else (new_surface_height - self.surface.get_height() + titlebar_height) // (self.icon_dimensions[1] + 3 * self.space[1]) + 1)
+			self.scroll = min(max(self.scroll, 0), self.get_grid().max_scroll(len(self.storage_units)))
 
 		if self.current_event.type == pygame.MOUSEBUTTONDOWN and self.current_event.button==1:
 			surface_units_range = ((self.surface.pos[0], self.surface.pos[1] + titlebar_height), (self.surface.pos[0] + self.surface.get_width(), self.surface.pos[1] + self.surface.get_height()))
 
 			if all([i < k < j for i,j,k in zip(surface_units_range[0],surface_units_range[1],self.current_event.pos)]):
 				offset = (self.current_event.pos[0] - surface_units_range[0][0], self.current_event.pos[1] - surface_units_range[0][1])
+				index = self.get_grid().index_at(offset[0], offset[1], len(self.storage_units), self.scroll)
 
-				limit_hor = self.surface.get_width() // (self.icon_dimensions[0] + (2 * self.space[0]))
-				# limit_ver = (self.surface.get_height() - titlebar_height) // (self.icon_dimensions[1] + (3 * self.space[1])) 
-
-				col, row = offset[0] // (self.icon_dimensions[0] + (2 * self.space[0])), offset[1] // (self.icon_dimensions[1] + (3 * self.space[1])) + self.scroll
-				index = int(row * limit_hor + col)
-
-				if index > len(self.storage_units) - 1:
-					self.storage_units = dict.fromkeys(self.current_dir.get_contents(), False) 
+				if index is None:
+					self.selected = set()
 
 				else:
+					unit = self.storage_units[index]
 					if not (pygame.key.get_mods() & pygame.KMOD_CTRL): 
-						for unit in self.storage_units:
-							if unit != list(self.storage_units.keys())[index]:
-								self.storage_units[unit] = False
-
-						if not self.storage_units[list(self.storage_units.keys())[index]]:
-							self.storage_units[list(self.storage_units.keys())[index]] = True
+						if unit not in self.selected:
+							self.selected = {unit}
 						
 						else:
+							self.selected = {unit}
 							if self.timer_running:
-								self.open(list(self.storage_units.keys())[index])
+								self.open(unit)
 			
 					else:
-						self.storage_units[list(self.storage_units.keys())[index]] = not self.storage_units[list(self.storage_units.keys())[index]]
+						self.selected.symmetric_difference_update({unit})
 
 		if self.current_event.type == pygame.MOUSEBUTTONDOWN and self.current_event.button==1:
 			self.timer = 0
 			self.timer_running = True
 
-		await self.event_handler()
-
 	async def graphics_handler(self):
 		await super().graphics_handler()
-		self.os.system.graphics.display_explorer_icons(self.surface, self.storage_units, self.icon_dimensions, self.space, self.scroll, self.file_icon_path, self.folder_icon_path)
+		self.os.system.graphics.display_explorer_icons(self.surface, self.get_grid(), self.storage_units, self.selected, self.icon_dimensions, self.space, self.scroll, self.file_icon_path, self.folder_icon_path)
+
+	def change_dir(self, directory):
+		self.current_dir = directory
+		self.scroll = 0
+		self.storage_units = list(self.current_dir.get_contents())
+		self.generation = self.current_dir.generation
+		self.selected = set()
 
 	def open(self, unit):
 		if isinstance(unit, File): logger.warn('WORK IN PROGRESS')
-		else: 
-			self.current_dir = unit
-			self.scroll = 0
-			self.storage_units = dict.fromkeys(self.current_dir.get_contents(), False)
+		else: self.change_dir(unit)
@@ -1,5 +1,14 @@
 import pygame
-import copy
+import inspect
+import time
+import re
+
+from collections import deque
+from fnmatch import fnmatch
+from heapq import merge
+from itertools import chain
+from operator import itemgetter
+from os.path import commonprefix
 
 from custom_logging.logging import get_logger
 from exceptions.storage_system import SUNameError, SUPathError, DirectoryElementError
@@ -9,6 +18,9 @@ from game.storage_system.directory import Directory, RootDir
 from game.storage_system.file import File
 from utils.text import Text
 from exceptions.applications import *
+from utils.profiler import profiler
+from game.pipeline import Pipeline, parse_command_line, iter_lines
+from game.job import Job
 
 
 logger = get_logger('game')
@@ -42,7 +54,17 @@ class Terminal(Application):
 			'cp': self._cp,
 			'mv': self._mv,
 			'pte': self._pte,
+			'profile': self._profile,
+			'grep': self._grep,
+			'head': self._head,
+			'find': self._find,
+			'jobs': self._jobs,
+			'fg': self._fg,
+			'bg': self._bg,
+			'kill': self._kill,
 		}
+		# Commands working with the Terminal itself, which run right away instead of as a Job.
+		self.interactive_commands = {'login', 'clear', 'cd', 'pte', 'fg', 'bg', 'kill'}
 
 		self.chars = self.starting_size[0] // 10
 		self.fontsize = (self.starting_size[0] / self.chars) * (5 / 3)
@@ -51,27 +73,58 @@ class Terminal(Application):
 		self.cursor.fill((255, 255, 255))
 		self.cursor.set_alpha(0)
 
-		self.content = Text(f'{self.get_new_line()}', (200, 200, 200), 'regular', self.fontsize, startingpos= [3, 3], ending=[self.chars - 1, ((self.starting_size[1] - titlebar_height) // self.fontsize) - 1])
+		self.content = Text(f'{self.get_new_line()}', (200, 200, 200), 'regular', self.fontsize, startingpos= [3, 3], ending=[self.chars - 1, ((self.starting_size[1] - titlebar_height) // self.fontsize) - 1], scrollback=terminal_scrollback)
 		self.stdin = ''
 
 		self.wait_for_input = None
 		self.hideinput = False
 
+		# Jobs by number, the one in the foreground, and how long printing its output may take each frame (in seconds).
+		self.jobs = {}
+		self.foreground = None
+		self.stream_budget = 0.005
+		# Keys typed while a Job runs in the foreground, handled once the prompt is back.
+		self.typeahead = deque(maxlen=256)
+		# Most completion candidates listed at once.
+		self.completions_shown = 100
+		# Storage units find and grep go through before giving other tasks a turn, when none of them gave output.
+		self.search_batch = 256
+
 	def new_line(self):
 		# logger.warn(self.content.get_raw_text())
 		# logger.warn('------------------------------')
+		self.report_jobs()
 		self.update_content(f'\n{self.get_new_line()}')
 		# logger.warn(self.content.get_raw_text())
 
 	def get_new_line(self):
 		return '⸸{c:green}⸸{s:italic}' + f'{self.os.username}' + '⸸{c:reset}⸸{s:reset}:' + '⸸{c:blue}' + f'{self.current_dir.get_path()}' + '⸸{c:reset}' + '> '	
 
-	def update_content(self, new):
-		self.content.update_string(new)
+	def update_content(self, string, new=False):
+		self.content.update_string(string, new=new)
+		self.invalidate()
+
+	async def run(self):
+		if self.foreground: self.stream_output()
+		await super().run()
+
+	def quit(self):
+		for job in self.jobs.values():
+			job.kill()
+		super().quit()
+
+	async def handle_event(self):
+		await super().handle_event()
+		if self.child_app: return
+		if self.foreground:
+			# Ctrl-C kills the foreground Job and Ctrl-Z stops it. Anything else typed meanwhile waits for the prompt.
+			if self.current_event.type == pygame.KEYDOWN and self.current_event.mod & pygame.KMOD_CTRL:
+				if self.current_event.key == pygame.K_c: self.kill_foreground()
+				if self.current_event.key == pygame.K_z: self.stop_foreground()
+			elif self.current_event.type in (pygame.KEYDOWN, pygame.TEXTINPUT):
+				self.typeahead.append(self.current_event)
+			return
 
-	async def event_handler(self):
-		await super().event_handler()
-		if not self.current_event or self.child_app: return
 		if self.current_event.type == pygame.KEYDOWN:
 			if self.current_event.key == pygame.K_RETURN:
 				if self.stdin == '':
@@ -87,16 +140,24 @@ class Terminal(Application):
 					self.stdin = self.stdin[:-1]
 					self.backlog[-1] = self.stdin
 					if not self.hideinput:
-						self.content.string = self.content.string[:-1]
-						self.content.process_string()
+						self.content.delete_last(1)
+						self.invalidate()
 			
+			if self.current_event.key == pygame.K_TAB:
+				if not self.hideinput and not self.wait_for_input: self.complete()
+
+			if self.current_event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+				rows = int(self.content.ending[1]) if self.current_event.key == pygame.K_PAGEUP else -int(self.content.ending[1])
+				self.content.scroll_by(rows)
+				self.invalidate()
+
 			if self.current_event.key == pygame.K_UP:
 				if not self.hideinput:
 					if self.b_pointer < min(len(self.backlog),49):
 						self.b_pointer+=1
 					logger.warn(self.b_pointer)
 					logger.warn(self.backlog)
-					self.content.string = self.content.string[:-len(self.stdin)] if len(self.stdin) > 0 else self.content.string
+					self.content.delete_last(len(self.stdin))
 					self.stdin = self.backlog[-self.b_pointer]
 					self.update_content(self.stdin)
 
@@ -106,38 +167,171 @@ class Terminal(Application):
 						self.b_pointer-=1
 					logger.warn(self.b_pointer)
 					logger.warn(self.backlog)
-					self.content.string = self.content.string[:-len(self.stdin)] if len(self.stdin) > 0 else self.content.string
+					self.content.delete_last(len(self.stdin))
 					self.stdin = self.backlog[-self.b_pointer]
 					self.update_content(self.stdin)
 
 		if self.current_event.type == pygame.TEXTINPUT:
-			self.stdin += self.current_event.text
+			# A command is a single line, so the line breaks of pasted text become spaces.
+			text = self.current_event.text.replace('\n', ' ').replace('\r', ' ')
+			self.stdin += text
 			self.backlog[-1] = self.stdin
 			if not self.hideinput:
-				self.update_content(self.current_event.text)
-
-		await self.event_handler()
+				self.update_content(text)
 
 	async def graphics_handler(self):
 		await super().graphics_handler()
 		self.os.system.graphics.display_terminal_text(self.surface, self.content)
-		T_half=500
-		val = lambda x: 1 - pow(1 - x, 4)
-		pass_val = lambda x: (T_half-abs(x%(2*T_half)-T_half))/T_half
-		alpha = 155 * val(pass_val(pygame.time.get_ticks()))
-		self.cursor.set_alpha(alpha) 
+
+	async def animate(self):
+		# The prompt is not on screen while scrolled back.
+		if self.content.scroll: return
+		self.cursor.set_alpha(self.cursor_alpha())
 		cursor_rect = self.cursor.get_rect(topleft=(self.content.processed[-1][-1][0]+self.fontsize*3/5*len(self.content.processed[-1][0]),titlebar_height+4+self.content.processed[-1][-1][1]))
-		self.surface.blit(self.cursor,cursor_rect)
+		self.draw_cursor(self.cursor, cursor_rect)
+
+	def complete(self):
+		"""
+		Completes the last word of the input, as a command name when it is the first word of a command and as a path
+		otherwise. When there are several candidates, the common part is completed and, failing that, the candidates
+		are listed.
+		"""
+
+		before, _, word = self.stdin.rpartition(' ')
+		if not before.strip() or before.rstrip().endswith('|'):
+			prefix = word
+			candidates = sorted(name for name in self.commands if name.startswith(prefix))
+			directory = None
+		else:
+			path, _, prefix = word.rpartition('/')
+			try:
+				directory = self.os.parse_path(f'{path}/', self.current_dir) if path else self.current_dir
+			except SUPathError:
+				return
+			if word.startswith('/') and not path: directory = self.os.root
+			candidates = directory.get_names_starting_with(prefix)
+
+		if not candidates: return
+		if len(candidates) == 1:
+			completion = candidates[0][len(prefix):]
+			completion += '/' if directory and isinstance(directory.get_su_by_name(candidates[0]), Directory) else ' '
+		else:
+			# The candidates are sorted, so what they all start with is what the first and the last start with.
+			completion = commonprefix([candidates[0], candidates[-1]])[len(prefix):]
+
+		if completion:
+			self.stdin += completion
+			self.backlog[-1] = self.stdin
+			self.update_content(completion)
+			return
+
+		shown = candidates[:self.completions_shown]
+		more = f'\n... and {len(candidates) - len(shown)} more' if len(candidates) > len(shown) else ''
+		self.update_content('\n' + '  '.join(shown) + more)
+		self.update_content(f'\n{self.get_new_line()}{self.stdin}')
 
 	async def run_command(self, stdin):
 		if self.wait_for_input: return await self.wait_for_input(stdin)
 		try:
-			args = stdin.strip().split(' ')
-			while '' in args: args.remove('')
-			cmd = args.pop(0)
-			return await self.commands[cmd.lower()](args)
-		except KeyError:
-			return self.response(1, None, 'Command Not Recognised')
+			stages, redirect, background = parse_command_line(stdin)
+		except TerminalCommandError as e:
+			return self.response(1, None, e.message)
+		if not stages: return self.response(0, None, None)
+
+		stages = [(name.lower(), args) for name, args in stages]
+		for name, _ in stages:
+			if name not in self.commands: return self.response(1, None, 'Command Not Recognised')
+
+		if len(stages) > 1 or redirect:
+			for name, _ in stages:
+				if not inspect.isasyncgenfunction(self.commands[name]): return self.response(1, None, f'{name} can not be used in a pipeline or redirected.')
+			command = Pipeline(self, stages, redirect).run()
+		else:
+			name, args = stages[0]
+			if name in self.interactive_commands:
+				if background: return self.response(1, None, f'{name} can not be run in the background.')
+				return await self.commands[name](args)
+			command = self.commands[name](args)
+
+		command_line = stdin.strip()
+		if background: command_line = command_line[:-1].rstrip()
+		job = self.start_job(command_line, command)
+		if background:
+			self.update_content(f'\n[{job.number}] {job.command_line}')
+			self.new_line()
+		else:
+			self.foreground = job
+
+	def start_job(self, command_line, command):
+		number = max(self.jobs, default=0) + 1
+		# The Job keeps as many lines as the scrollback, so whatever it drops would have scrolled out anyway.
+		job = Job(number, command_line, command, buffer_size=terminal_scrollback)
+		self.jobs[number] = job
+		return job
+
+	def get_job(self, command, args):
+		"""Returns the Job given as %<number> or <number> in args, or the latest one without args."""
+
+		if not args:
+			if not self.jobs: raise TerminalCommandError(command, 'No current job.')
+			return self.jobs[max(self.jobs)]
+		try:
+			return self.jobs[int(args[0].lstrip('%'))]
+		except (ValueError, KeyError):
+			raise TerminalCommandError(command, f'{args[0]}: No such job.')
+
+	def stream_output(self):
+		"""
+		Prints the output buffered by the foreground Job until the budget for this frame runs out.
+
+		Once the Job is done and all of its output is printed, its result is printed and it is removed.
+		"""
+
+		job = self.foreground
+		deadline = time.perf_counter() + self.stream_budget
+		# Laying the lines out takes time too, so it is done in batches within the budget.
+		while job.output and time.perf_counter() < deadline:
+			lines = [job.output.popleft() for _ in range(min(64, len(job.output)))]
+			self.update_content('\n' + '\n'.join(lines))
+
+		if job.done and not job.output:
+			self.foreground = None
+			del self.jobs[job.number]
+			self.response(job.exit_code, None, job.error)
+			self.release_typeahead()
+		else:
+			self.os.system.scheduler.wake()
+
+	def kill_foreground(self):
+		self.foreground.kill()
+		self.foreground.output.clear()
+		self.update_content('^C')
+
+	def stop_foreground(self):
+		job = self.foreground
+		# A Job that is done only has output left to print, which stream_output() finishes. Commands that are plain
+		# coroutines, like cp and mkdir, can only be killed.
+		if job.done or not job.stoppable: return
+		job.stop()
+		self.foreground = None
+		self.update_content(f'^Z\n{job}')
+		self.new_line()
+		self.release_typeahead()
+
+	def release_typeahead(self):
+		"""Puts the keys typed while the foreground Job ran back in front of the events, for the prompt to handle."""
+
+		self.event_queue.extendleft(reversed(self.typeahead))
+		self.typeahead.clear()
+
+	def report_jobs(self):
+		"""Prints the background Jobs which finished since the last prompt. Jobs with output left wait for fg."""
+
+		for job in list(self.jobs.values()):
+			if not job.done or job.reported or job is self.foreground: continue
+			self.update_content(f'\n{job}')
+			job.reported = True
+			if not job.output: del self.jobs[job.number]
 
 	def response(self, exit_code, stdout, stderr, update_in_terminal=True):
 		if update_in_terminal:
@@ -166,36 +360,25 @@ class Terminal(Application):
 		self.hideinput = True
 
 	async def _ip(self, _):
-		return self.response(0, self.os.system.get_ip(), None)
+		yield self.os.system.get_ip()
 
 	async def _pwd(self, _):
-		return self.response(0, self.current_dir.get_path(), None)
+		yield self.current_dir.get_path()
 
 	async def _tree(self, _):
-		return self.response(0, self.current_dir.bfs(), None)
+		for line in self.current_dir.tree_lines():
+			yield line
 
 	async def _ls(self, _):
-		return self.response(0, '\n'.join([su.get_name() for su in self.current_dir.contents]), None)
+		for su in self.current_dir.get_contents():
+			yield su.get_name()
 
 	async def _clear(self, _):
-		self.content.update_string(self.get_new_line(), new=True)
+		self.update_content(self.get_new_line(), new=True)
 		return self.response(0, None, None, update_in_terminal=False)
 
 	async def _echo(self, args):
-		if '>>' in args:
-			sep = args.index('>>')
-			if not (len(args) - 1 > sep): return self.response(0, ' '.join(args), None)
-			text = ' '.join(args[:sep])
-			fl = args[sep + 1]
-			try:
-				su = self.os.parse_path(fl, self.current_dir)
-			except SUPathError as e: return self.response(1, None, e.message)
-			if not isinstance(su, File): return self.response(1, None, 'Argument after \'>>\' must be a file.')
-			su.set_contents(text)
-			return self.response(0, None, None)
-
-		else:
-			return self.response(0, ' '.join(args), None)
+		yield ' '.join(args)
 
 	async def _cd(self, args):
 		path = '/' if len(args) < 1 else args[0]
@@ -210,73 +393,210 @@ class Terminal(Application):
 		return self.response(0, None, None)
 
 	async def _cat(self, args):
-		if len(args) < 1: return self.response(1, None, 'Too few Arguments. Use the \'help\' command for more info on commands.')
+		if len(args) < 1: raise TerminalCommandError('cat', 'Too few Arguments. Use the \'help\' command for more info on commands.')
 
-		try:
-			su = self.os.parse_path(args[0], self.current_dir)
-		except SUPathError as e:
-			return self.response(1, None, e.message)
+		errors = []
+		for path, su in zip(args, self.os.resolve_paths(args, self.current_dir)):
+			if isinstance(su, SUPathError):
+				errors.append(self.path_error(args, path, su.message))
+				continue
+			if not isinstance(su, File):
+				errors.append(self.path_error(args, path, 'Argument must be a File.'))
+				continue
 
-		if not isinstance(su, File): return self.response(1, None, 'Argument must be a File.')
-		return self.response(0, str(su.get_contents()), None)
-	
-	async def _rm(self, args):
-		if len(args) < 1: return self.response(1, None, 'Too few Arguments. Use the \'help\' command for more info on commands.')
+			contents = str(su.get_contents())
+			if not contents: continue
+			for line in iter_lines(contents):
+				yield line
+
+		if errors: raise TerminalCommandError('cat', '\n'.join(errors))
+
+	async def _grep(self, args, stdin=None):
+		if len(args) < 1: raise TerminalCommandError('grep', 'Too few arguments.\nSyntax: grep <pattern> [file or directory]')
 
 		try:
-			su = self.os.parse_path(args[0], self.current_dir)
-			if self.os.su_open_in_app(su): return self.response(1, None, f'{su.__class__.__name__} is open in another application.')
-		except SUPathError as e:
-			return self.response(1, None, e.message)
+			pattern = re.compile(args[0])
+		except re.error as e:
+			raise TerminalCommandError('grep', f'Invalid pattern: {e}.')
 
-		su.get_parent().delete(su.get_name())
-		return self.response(0, None, None)
+		if len(args) > 1:
+			try:
+				su = self.os.parse_path(args[1], self.current_dir)
+			except SUPathError as e:
+				raise TerminalCommandError('grep', e.message)
+			if isinstance(su, Directory):
+				async for line in self._grep_directory(pattern, su):
+					yield line
+				return
+
+		async for line in self._input('grep', args[1:], stdin):
+			if pattern.search(line): yield line
+
+	async def _grep_directory(self, pattern, directory):
+		"""Yields the matching lines of every File with text contents under directory, prefixed with its path."""
+
+		index = self.os.root.index
+		candidates = index.grep_candidates(pattern.pattern) if index else None
+		if candidates is None:
+			files = (su for su in directory.walk() if isinstance(su, File))
+		else:
+			files = self.by_path(candidates, directory)
+
+		# Whole Files are checked first, in one go, with line anchors matching at every line.
+		anchored = '\\A' in pattern.pattern or '\\Z' in pattern.pattern
+		whole = re.compile(pattern.pattern, re.MULTILINE)
+		for count, file in enumerate(files, start=1):
+			if file is None:
+				yield None
+				continue
+			contents = file.get_contents()
+			if isinstance(contents, str) and (anchored or whole.search(contents)):
+				path = file.get_path()
+				for line in iter_lines(contents):
+					if pattern.search(line): yield f'{path}:{line}'
+			elif not count % self.search_batch:
+				yield None
+
+	async def _find(self, args):
+		syntax = 'Syntax: find [path] [-name <pattern>] [-type f|d]'
+		start = self.current_dir
+		if args and not args[0].startswith('-'):
+			try:
+				start = self.os.parse_path(args[0], self.current_dir)
+			except SUPathError as e:
+				raise TerminalCommandError('find', e.message)
+			args = args[1:]
+
+		name = kind = None
+		while args:
+			if len(args) < 2: raise TerminalCommandError('find', syntax)
+			if args[0] == '-name': name = args[1]
+			elif args[0] == '-type' and args[1] in ('f', 'd'): kind = File if args[1] == 'f' else Directory
+			else: raise TerminalCommandError('find', syntax)
+			args = args[2:]
+
+		index = self.os.root.index
+		if name and index:
+			for su in self.by_path(index.find(name), start):
+				if su is None: yield None
+				elif not kind or isinstance(su, kind): yield su.get_path()
+			return
+
+		units = start.walk() if isinstance(start, Directory) else iter(())
+		for count, su in enumerate(chain((start,), units), start=1):
+			if (not kind or isinstance(su, kind)) and (not name or fnmatch(su.get_name(), name)):
+				yield su.get_path()
+			elif not count % self.search_batch:
+				yield None
+
+	def by_path(self, units, start):
+		"""
+		Yields the storage units out of units which are start or under it, ordered by their path.
+
+		Paths are worked out and sorted search_batch storage units at a time, with None yielded after every batch
+		so the command can give other tasks a turn, and the sorted batches are merged as they are read.
+		"""
+
+		batches = []
+		batch = []
+		for count, su in enumerate(units, start=1):
+			if su is start or isinstance(start, Directory) and start.is_ancestor_of(su):
+				batch.append((su.get_path(), su))
+			if not count % self.search_batch:
+				batches.append(sorted(batch, key=itemgetter(0)))
+				batch = []
+				yield None
+		batches.append(sorted(batch, key=itemgetter(0)))
+
+		for _, su in merge(*batches, key=itemgetter(0)):
+			yield su
+
+	async def _head(self, args, stdin=None):
+		count = 10
+		if args[:1] == ['-n']:
+			try:
+				count = int(args[1])
+			except (IndexError, ValueError):
+				raise TerminalCommandError('head', 'Syntax: head [-n <number of lines>] [file]')
+			args = args[2:]
 
-	async def _mkdir(self, args):
-		if len(args) < 1: return self.response(1, None, 'Too few Arguments. Use the \'help\' command for more info on commands.')
+		if count <= 0: return
+		async for line in self._input('head', args, stdin):
+			yield line
+			count -= 1
+			if count <= 0: return
 
-		path = args[0].split('/')
-		name = path.pop()
-		if name == '': name = path.pop()
+	async def _input(self, command, args, stdin):
+		"""Yields the lines of the File named in args, or of stdin when there is none."""
 
-		if len(path) > 0:
+		if args:
 			try:
-				destination = self.os.parse_path(f'{"/".join(path)}/', self.current_dir)
+				su = self.os.parse_path(args[0], self.current_dir)
 			except SUPathError as e:
-				return self.response(1, None, e.message)
-		else: destination = self.current_dir
+				raise TerminalCommandError(command, e.message)
+			if not isinstance(su, File): raise TerminalCommandError(command, f'{args[0]} is not a File.')
+			for line in iter_lines(str(su.get_contents())):
+				yield line
+		elif stdin:
+			async for line in stdin:
+				yield line
+		else:
+			raise TerminalCommandError(command, 'No input. Give it a file or pipe something into it.')
+	
+	async def _rm(self, args):
+		if len(args) < 1: raise TerminalCommandError('rm', 'Too few Arguments. Use the \'help\' command for more info on commands.')
+
+		errors = []
+		for path, su in zip(args, self.os.resolve_paths(args, self.current_dir)):
+			if isinstance(su, SUPathError):
+				errors.append(self.path_error(args, path, su.message))
+			elif su.get_parent() is None:
+				errors.append(self.path_error(args, path, 'Cannot remove the root Directory.'))
+			elif self.os.su_open_in_app(su):
+				errors.append(self.path_error(args, path, f'{su.__class__.__name__} is open in another application.'))
+			else:
+				su.get_parent().delete(su.get_name())
 
-		try:
-			await self.os.make_dir(name, [], destination)
-		except SUPathError as e:
-			return self.response(1, None, e.message)
+		if errors: raise TerminalCommandError('rm', '\n'.join(errors))
 
-		return self.response(0, None, None)
+	async def _mkdir(self, args):
+		if len(args) < 1: raise TerminalCommandError('mkdir', 'Too few Arguments. Use the \'help\' command for more info on commands.')
 
-	async def _touch(self, args):
-		if len(args) < 1: return self.response(1, None, 'Too few Arguments. Use the \'help\' command for more info on commands.')
+		errors = []
+		for path, destination in zip(args, self.os.resolve_paths(args, self.current_dir, parent_dir=True)):
+			name = path.rstrip('/').split('/')[-1]
+			try:
+				if isinstance(destination, SUPathError): raise destination
+				await self.os.make_dir(name, [], destination)
+			except (SUPathError, SUNameError, DirectoryElementError) as e:
+				errors.append(self.path_error(args, path, e.message))
 
-		path = args[0].split('/')
-		name = path.pop()
-		if name == '': return self.response(1, None, 'You need to provide a file name.')
+		if errors: raise TerminalCommandError('mkdir', '\n'.join(errors))
 
-		if len(path) > 0:
+	async def _touch(self, args):
+		if len(args) < 1: raise TerminalCommandError('touch', 'Too few Arguments. Use the \'help\' command for more info on commands.')
+
+		errors = []
+		for path, destination in zip(args, self.os.resolve_paths(args, self.current_dir, parent_dir=True)):
+			name = path.split('/')[-1]
 			try:
-				destination = self.os.parse_path(f'{"/".join(path)}/', self.current_dir)
-			except SUPathError as e:
-				return self.response(1, None, e.message)
-		else: destination = self.current_dir 
+				if name == '': raise SUNameError(name, 'You need to provide a file name.')
+				if isinstance(destination, SUPathError): raise destination
+				await self.os.make_file(name, '', destination)
+			except (SUPathError, SUNameError, DirectoryElementError) as e:
+				errors.append(self.path_error(args, path, e.message))
 
-		try:
-			await self.os.make_file(name, '', destination)
-		except SUPathError as e:
-			return self.response(1, None, e.message)
+		if errors: raise TerminalCommandError('touch', '\n'.join(errors))
 
-		return self.response(0, None, None)
+	@staticmethod
+	def path_error(args, path, message):
+		"""Returns the error message for one of the paths in args, saying which one when there are many."""
+
+		return f'{path}: {message}' if len(args) > 1 else message
 
 	async def _mv(self, args):
 		if len(args) < 2:
-			return self.response(1, None, 'Too few Arguments. Use the \'help\' command for more info on commands.')
+			raise TerminalCommandError('mv', 'Too few Arguments. Use the \'help\' command for more info on commands.')
 
 		check_type = None
 
@@ -290,9 +610,9 @@ class Terminal(Application):
 
 		try:
 			old = self.os.parse_path(old, relative_to=self.current_dir)
-			if self.os.su_open_in_app(old): return self.response(1, None, f'{old.__class__.__name__} is open in another application.')
+			if self.os.su_open_in_app(old): raise TerminalCommandError('mv', f'{old.__class__.__name__} is open in another application.')
 		except SUPathError as e:
-			return self.response(1, None, e.message)
+			raise TerminalCommandError('mv', e.message)
 		
 		try:
 			new = self.os.parse_path(new, relative_to=self.current_dir)
@@ -300,36 +620,42 @@ class Terminal(Application):
 			try:
 				new_dir = self.os.parse_path(new, relative_to=self.current_dir, parent_dir=True)
 			except SUPathError as e:
-				return self.response(1, None, e.message)
+				raise TerminalCommandError('mv', e.message)
 			if check_type:
 				if not isinstance(old, Directory):
-					return self.response(1, None, 'Cannot put a file as a directory.')
+					raise TerminalCommandError('mv', 'Cannot put a file as a directory.')
 			if isinstance(old, Directory):
-				if old.has_su(new_dir) or old == new_dir:
-					return self.response(1, None ,'Cannot move a directory to a subdirectory of itself.')
+				if old.is_ancestor_of(new_dir) or old == new_dir:
+					raise TerminalCommandError('mv', 'Cannot move a directory to a subdirectory of itself.')
+			name = new.split('/')[-1]
+			parent = old.get_parent()
+			if new_dir is parent:
+				# Just a rename, which keeps the storage unit where it is in the Directory.
+				try:
+					old.set_name(name)
+				except SUNameError as e:
+					raise TerminalCommandError('mv', e.message)
+				return
+
 			try:
-				old.set_name(new.split('/')[-1])
-			except SUNameError as e:
-				return self.response(1, None, e.message)
-			old.get_parent().delete(old.get_name())
-			new_dir.add(old)
-			return self.response(0, None, None)
+				new_dir.add_as(old, name)
+			except (SUNameError, DirectoryElementError) as e:
+				raise TerminalCommandError('mv', e.message)
 		else:
 			if not isinstance(new, Directory):
-				return self.response(1, None, f'A {new.__class__.__name__} with that name already exists in the destination path.')
+				raise TerminalCommandError('mv', f'A {new.__class__.__name__} with that name already exists in the destination path.')
 			else:
 				if isinstance(old, Directory):
-					if old.has_su(new) or old == new:
-						return self.response(1, None ,'Cannot move a directory to a subdirectory of itself.')
+					if old.is_ancestor_of(new) or old == new:
+						raise TerminalCommandError('mv', 'Cannot move a directory to a subdirectory of itself.')
 				try:
 					new.add(old)
 				except DirectoryElementError as e:
-					return self.response(1, None, e.message)
-				return self.response(0, None, None)
+					raise TerminalCommandError('mv', e.message)
 
 	async def _cp(self, args):
 		if len(args) < 2:
-			return self.response(1, None, 'Too few arguments.\nSyntax: cp <oldpath> <newpath>')
+			raise TerminalCommandError('cp', 'Too few arguments.\nSyntax: cp <oldpath> <newpath>')
 
 		check_type = None
 
@@ -344,9 +670,9 @@ class Terminal(Application):
 		try:
 			old = self.os.parse_path(old, relative_to=self.current_dir)
 			if isinstance(old, RootDir):
-				return self.response(1, None, 'Cannot copy root directory into itself.')
+				raise TerminalCommandError('cp', 'Cannot copy root directory into itself.')
 		except SUPathError as e:
-			return self.response(1, None, e.message)
+			raise TerminalCommandError('cp', e.message)
 		
 		try:
 			new = self.os.parse_path(new, relative_to=self.current_dir)
@@ -354,30 +680,84 @@ class Terminal(Application):
 			try:
 				new_dir = self.os.parse_path(new, relative_to=self.current_dir, parent_dir=True)
 			except SUPathError as e:
-				return self.response(1, None, e.message)
+				raise TerminalCommandError('cp', e.message)
 			if check_type:
 				if not isinstance(old, Directory):
-					return self.response(1, None, 'Cannot put a file as a directory.')
-			try:
-				if isinstance(old, File):
-					await self.os.make_file(new.split('/')[-1], copy.deepcopy(old.get_contents()), new_dir)
-				else:
-					await self.os.make_dir(new.split('/')[-1], copy.deepcopy(old.get_contents()), new_dir)
-			except DirectoryElementError as e:
-				return self.response(1, None, e.message)
-			return self.response(0, None, None)
+					raise TerminalCommandError('cp', 'Cannot put a file as a directory.')
+			name = new.split('/')[-1]
+			new = new_dir
 		else:
 			if not isinstance(new, Directory):
-				return self.response(1, None, f'A {new.__class__.__name__} with that name already exists in the destination path.')
+				raise TerminalCommandError('cp', f'A {new.__class__.__name__} with that name already exists in the destination path.')
+			name = old.get_name()
+
+		# make_file and make_dir build new Storage Units from the contents, so they are not deep copied here.
+		try:
+			if isinstance(old, File):
+				await self.os.make_file(name, old.get_contents(), new)
 			else:
-				try:
-					if isinstance(old, File):
-						await self.os.make_file(old.get_name(), copy.deepcopy(old.get_contents()), new)
-					else:
-						await self.os.make_dir(old.get_name(), copy.deepcopy(old.get_contents()), new)
-				except DirectoryElementError as e:
-					return self.response(1, None, e.message)
-				return self.response(0, None, None)
+				await self.os.make_dir(name, old.get_contents(), new)
+		except (SUNameError, DirectoryElementError) as e:
+			raise TerminalCommandError('cp', e.message)
+
+	async def _jobs(self, _):
+		for job in list(self.jobs.values()):
+			if job is self.foreground: continue
+			# Listing a finished Job tells about it, so it is not reported again at the next prompt.
+			if job.done:
+				job.reported = True
+				if not job.output: del self.jobs[job.number]
+			yield str(job)
+
+	async def _fg(self, args):
+		try:
+			job = self.get_job('fg', args)
+		except TerminalCommandError as e:
+			return self.response(1, None, e.message)
+
+		self.update_content(f'\n{job.command_line}')
+		job.resume()
+		self.foreground = job
+
+	async def _bg(self, args):
+		try:
+			job = self.get_job('bg', args)
+		except TerminalCommandError as e:
+			return self.response(1, None, e.message)
+
+		if job.done: return self.response(1, None, f'Job {job.number} has already finished.')
+		job.resume()
+		return self.response(0, f'[{job.number}] {job.command_line} &', None)
+
+	async def _kill(self, args):
+		if len(args) < 1: return self.response(1, None, 'Too few arguments.\nSyntax: kill %<job number>')
+		try:
+			job = self.get_job('kill', args)
+		except TerminalCommandError as e:
+			return self.response(1, None, e.message)
+
+		if job.done: return self.response(1, None, f'Job {job.number} has already finished.')
+		job.kill()
+		return self.response(0, None, None)
+
+	async def _profile(self, args):
+		action = args[0].lower() if args else 'stats'
+		if action == 'on':
+			profiler.enable()
+			yield 'Profiling enabled.'
+		elif action == 'off':
+			profiler.disable()
+			yield 'Profiling disabled.'
+		elif action == 'reset':
+			profiler.reset()
+		elif action == 'stats':
+			if not profiler.samples:
+				yield 'Nothing profiled yet. Use \'profile on\' first.'
+				return
+			for line in profiler.report().split('\n'):
+				yield line
+		else:
+			raise TerminalCommandError('profile', 'Usage: profile [on|off|stats|reset]')
 
 	async def _pte(self, args):
 		if len(args) < 1:
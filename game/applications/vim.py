@@ -3,6 +3,7 @@ from utils.text import Text
 from game.application import TerminalApplication
 from game.applications.terminal import Terminal
 from custom_logging.logging import get_logger
+from utils.profiler import profiler
 from game.constants import titlebar_height
 from game.constants import titlebar_height
 import pygame
@@ -48,8 +49,9 @@ class PilotTextEditor(TerminalApplication):
 		self.status = Text(self.input_command, (166, 226, 46), 'regular', master_terminal.fontsize, startingpos= [3, master_terminal.starting_size[1]-titlebar_height-master_terminal.fontsize], ending=master_terminal.content.ending)
 
 	async def run(self):
-		await self.event_handler()
-		await self.graphics_handler()
+		with profiler.measure(self, 'run'):
+			await self.handle_events()
+			await self.redraw()
 
 	def add_line_num(self, string):
 		split_lines = string.split("\n")
@@ -63,20 +65,18 @@ class PilotTextEditor(TerminalApplication):
 
 	async def graphics_handler(self):
 		await super().graphics_handler()
-		T_half=500
-		val = lambda x: 1 - pow(1 - x, 4)
-		pass_val = lambda x: (T_half-abs(x%(2*T_half)-T_half))/T_half
-		alpha = 155 * val(pass_val(pygame.time.get_ticks()))
-		self.cursor.set_alpha(alpha) 
-		cursor_rect = self.cursor.get_rect(topleft=(3+(self.cur_pos[0]+4)*self.font_size,titlebar_height+6+(self.cur_pos[1]-1)*self.font_size*5/3))
-		self.surface.blit(self.cursor,cursor_rect)
-		#self.cursor.topleft= (3+(self.cur_pos[0]-1)*self.font_size,titlebar_height+3+(self.cur_pos[1]-1)*self.font_size)
 		self.os.system.graphics.display_terminal_text(self.surface, self.content)
 		self.os.system.graphics.display_terminal_text(self.surface, self.status)
 
-	async def event_handler(self):
-		await super().event_handler()
-		if not self.current_event: return
+	async def animate(self):
+		self.cursor.set_alpha(self.cursor_alpha())
+		cursor_rect = self.cursor.get_rect(topleft=(3+(self.cur_pos[0]+4)*self.font_size,titlebar_height+6+(self.cur_pos[1]-1)*self.font_size*5/3))
+		#self.cursor.topleft= (3+(self.cur_pos[0]-1)*self.font_size,titlebar_height+3+(self.cur_pos[1]-1)*self.font_size)
+		self.draw_cursor(self.cursor, cursor_rect)
+
+	async def handle_event(self):
+		await super().handle_event()
+		if self.current_event.type in (pygame.KEYDOWN, pygame.TEXTINPUT): self.invalidate()
 
 		#if self.current_event.type == pygame.KEYDOWN and self.current_event.key == pygame.K_RETURN:
 			#await self.run_command(self.stdin)
@@ -84,7 +84,6 @@ class PilotTextEditor(TerminalApplication):
 
 		if self.skip:
 			self.skip = False
-			await self.event_handler()
 			return
 
 		if self.current_event.type == pygame.TEXTINPUT:
@@ -92,11 +91,14 @@ class PilotTextEditor(TerminalApplication):
 			if self.cur_mode == self.modes.index("INSERT"):
 				offset = sum([len(i)+1 for i in self.stdin.split("\n")[:self.cur_pos[1]-1]])+1 - (1 if len(self.stdin.split("\n"))==self.cur_pos[1] else 0)
 				pos = offset + self.cur_pos[0]-1
-				self.stdin = self.stdin[:pos] + self.current_event.text + self.stdin[pos:]
-				if '\n' in self.current_event.text:
-					self.cur_pos[1]+=1
+				text = self.current_event.text.replace('\r\n', '\n')
+				self.stdin = self.stdin[:pos] + text + self.stdin[pos:]
+				# Pasted text can span lines, in which case the cursor ends up after its last line.
+				lines = text.split('\n')
+				if len(lines) > 1:
+					self.cur_pos[:] = [len(lines[-1])+1, self.cur_pos[1]+len(lines)-1]
 				else:
-					self.cur_pos[0]+=1
+					self.cur_pos[0]+=len(text)
 				if not self.hideinput:
 					self.update_content(self.add_line_num(self.stdin), new=True)
 				if self.content.string != self.editing_file.get_contents():
@@ -149,8 +151,6 @@ class PilotTextEditor(TerminalApplication):
 			if self.cur_mode == self.modes.index("NORMAL"):
 				if not self.current_event.key == pygame.K_ESCAPE:
 					self.skip = self.add_keystroke(self.current_event)
-
-		await self.event_handler()
 	
 	def clear_keystrokes(self):
 		self.keystrokes = ""
@@ -18,3 +18,16 @@ y_align = {
 }
 
 double_click_window = 2
+
+# Number of lines the Terminal keeps for scrolling back.
+terminal_scrollback = 1000
+
+# Whether the file system keeps an index of names for find, and of the trigrams of File contents for grep.
+file_system_index = True
+file_contents_index = True
+
+# Number of resolved paths the OperatingSystem keeps cached.
+path_cache_size = 1024
+
+# Seconds the text cursor stays on, and then off, when blinking.
+cursor_blink_interval = 0.5
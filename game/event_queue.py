@@ -0,0 +1,36 @@
+import pygame
+
+from collections import deque
+
+
+class EventQueue(deque):
+	"""Queue of the pygame events an Application has yet to handle.
+
+	Events are taken from the front in O(1). A MOUSEMOTION queued right after another one with the same buttons held
+	is merged into it, keeping the latest position and adding up the relative motion, so a burst of mouse motion is
+	handled as a single event. Likewise, a run of TEXTINPUT events is taken from the queue as one event with all of
+	their text, so pasted or fast typed text is handled as a single edit.
+	"""
+
+	def popleft(self):
+		event = super().popleft()
+		if event.type != pygame.TEXTINPUT or not self or self[0].type != pygame.TEXTINPUT: return event
+		texts = [event.text]
+		while self and self[0].type == pygame.TEXTINPUT:
+			texts.append(super().popleft().text)
+		return pygame.event.Event(pygame.TEXTINPUT, {**event.dict, 'text': ''.join(texts)})
+
+	def append(self, event):
+		if event.type == pygame.MOUSEMOTION and self and self[-1].type == pygame.MOUSEMOTION and self[-1].buttons == event.buttons:
+			last = self[-1]
+			self[-1] = pygame.event.Event(pygame.MOUSEMOTION, {**last.dict, 'pos': event.pos, 'rel': (last.rel[0] + event.rel[0], last.rel[1] + event.rel[1])})
+			return
+		super().append(event)
+
+	def extend(self, events):
+		for event in events:
+			self.append(event)
+
+	def __iadd__(self, events):
+		self.extend(events)
+		return self
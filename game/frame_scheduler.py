@@ -0,0 +1,129 @@
+import asyncio
+import heapq
+import time
+import pygame
+
+from custom_logging.logging import get_logger
+from utils.profiler import profiler
+
+
+logger = get_logger('game')
+
+
+class FrameScheduler(object):
+	"""Runs a System one frame at a time and sleeps between frames.
+
+	Every frame goes through an update phase (input and applications), a render phase (compositing the damaged
+	regions) and a present phase (updating the display). Between frames the scheduler sleeps until the next frame
+	is due. When nothing has happened for a while it drops to the idle frame rate and wakes up early for the next
+	input event or timer deadline. Animations schedule their next frame as a deadline, so the idle frame rate only
+	applies when nothing is animating either.
+
+	Attributes:
+		system -- System being run.
+		frame_time -- Target time between frames, in seconds. 0 runs frames back to back and never goes idle.
+		idle_frame_time -- Time between frames while idle, in seconds.
+		idle_after -- Seconds without activity before the scheduler goes idle.
+		poll_interval -- How often pending input is checked for while sleeping in idle mode, in seconds.
+		frames -- Number of frames run so far.
+	"""
+
+	def __init__(self, system, fps=30, idle_fps=5, idle_after=2):
+		"""
+		Parameters:
+			system -- System being run.
+			fps -- Target frame rate. 0 runs frames back to back.
+			idle_fps -- Frame rate while nothing is happening.
+			idle_after -- Seconds without activity before the scheduler goes idle.
+		"""
+
+		self.system = system
+		self.frame_time = 1 / fps if fps else 0
+		self.idle_frame_time = 1 / idle_fps
+		self.idle_after = idle_after
+		self.poll_interval = 1 / 120
+
+		self.frames = 0
+		self.running = False
+		self.deadlines = []
+		self.last_activity = time.perf_counter()
+		self.last_frame = None
+
+	def wake(self):
+		"""Marks that something is happening, keeping the scheduler at the full frame rate."""
+
+		self.last_activity = time.perf_counter()
+
+	def schedule(self, delay):
+		"""Makes sure a frame runs once delay seconds have passed, even while idle."""
+
+		heapq.heappush(self.deadlines, time.perf_counter() + delay)
+
+	def animating(self):
+		"""Makes sure the next frame runs at the full frame rate, for something animating on screen."""
+
+		if self.deadlines and self.deadlines[0] <= time.perf_counter() + self.frame_time: return
+		self.schedule(self.frame_time)
+
+	def is_idle(self, now=None):
+		# Uncapped runs are for benchmarks, which should never wait on input.
+		if not self.frame_time: return False
+		now = now if now else time.perf_counter()
+		return now - self.last_activity > self.idle_after
+
+	async def run(self, max_frames=None):
+		"""Runs frames until stopped, or until max_frames frames have been run."""
+
+		logger.info('Starting Frame Scheduler...')
+		self.running = True
+		while self.running and (max_frames is None or self.frames < max_frames):
+			start = time.perf_counter()
+			await self.step()
+			await self.wait(start)
+
+	def stop(self):
+		self.running = False
+
+	async def step(self):
+		"""Runs a single frame."""
+
+		now = time.perf_counter()
+		self.system.graphics.conn_pygame_graphics.dt = now - self.last_frame if self.last_frame else self.frame_time
+		self.last_frame = now
+		while self.deadlines and self.deadlines[0] <= now:
+			heapq.heappop(self.deadlines)
+
+		profiler.begin_frame()
+		if await self.update(): self.wake()
+		self.render()
+		self.present()
+		profiler.end_frame(self.frame_time)
+		self.frames += 1
+
+	async def update(self):
+		"""Handles input and runs the applications. Returns whether there was any input."""
+
+		return await self.system.os.update()
+
+	def render(self):
+		self.system.graphics_handler()
+
+	def present(self):
+		self.system.graphics.conn_pygame_graphics.present()
+
+	async def wait(self, frame_start):
+		"""Sleeps until the next frame is due, waking up early for input or timers while idle."""
+
+		if not self.is_idle():
+			await asyncio.sleep(max(0, frame_start + self.frame_time - time.perf_counter()))
+			return
+
+		until = frame_start + self.idle_frame_time
+		if self.deadlines: until = min(until, self.deadlines[0])
+		while True:
+			remaining = until - time.perf_counter()
+			if remaining <= 0: return
+			if pygame.event.peek():
+				self.wake()
+				return
+			await asyncio.sleep(min(remaining, self.poll_interval))
@@ -1,4 +1,5 @@
 from re import U
+from collections import OrderedDict
 import pygame
 
 from custom_logging.logging import get_logger
@@ -15,9 +16,13 @@ class Graphics(object):
 	def __init__(self, conn_pygame_graphics):
 		self.conn_pygame_graphics = conn_pygame_graphics
 
+		# Rendered explorer icon blocks keyed by (unit, selected, full_name), least recently used first.
+		self.icon_blocks = OrderedDict()
+		self.icon_block_capacity = 512
+
 	def get_system_surface(self):
 		surface = Surface((self.conn_pygame_graphics.win.get_width(), self.conn_pygame_graphics.win.get_height()), (0, 0))
-		self.conn_pygame_graphics.push_surface(surface)
+		self.conn_pygame_graphics.push_surface(surface, overlay=True)
 		return surface
 
 	def draw_application_window(self, width, height, color, name, titlebar=True) -> Surface:
@@ -35,7 +40,7 @@ class Graphics(object):
 	def rendered_icon(self, path_from_res, icon_name, text_colour, font_size, text_gap, height=-1, width=-1, additive=True):
 		image = self.conn_pygame_graphics.convert_to_pygame_image(path_from_res)
 		icon = Surface(((image.get_width()+20 if width < 0 else width+20), (image.get_height()+30 if height < 0 else height+30)),(0,0))
-		image = pygame.transform.scale(image, (width if width > 0 else image.get_width(), height if height > 0 else image.get_height()))
+		image = self.conn_pygame_graphics.scaled_image(path_from_res, (width if width > 0 else image.get_width(), height if height > 0 else image.get_height()))
 		self.conn_pygame_graphics.blit_image((10, 10), image, height, width, additive, 0b0000, icon)
 		self.conn_pygame_graphics.render_text('regular', font_size, icon_name, text_colour, point=(((width+20 if width != -1 else image.get_width()+20)/2), (height+20 if height != -1 else image.get_height()+20)+text_gap), background=None, alignment=0b1000, surface=icon)
 		return icon
@@ -52,64 +57,55 @@ class Graphics(object):
 	def fill_application_window(self, surface, color):
 		self.conn_pygame_graphics.draw_rect(color, 0, titlebar_height, surface.get_width(), surface.get_height() - titlebar_height, width=0, surface=surface)
 
-	def display_explorer_icons(self, surface, units, icon_dimensions, space, scroll, file_icon_path, folder_icon_path):
+	def display_explorer_icons(self, surface, grid, units, selected, icon_dimensions, space, scroll, file_icon_path, folder_icon_path):
 		explorer_surface = pygame.Surface((surface.get_width(), surface.get_height() - titlebar_height), pygame.SRCALPHA)
 		explorer_surface.fill((0, 0, 0, 0))
 
-		limit = explorer_surface.get_width() // (icon_dimensions[0] + (2 * space[0]))
-		new_surface_height = ((icon_dimensions[1] + (3 * space[1])) * ((len(units.keys()) // limit) + 2))
-
-		scroll_bar_width = (explorer_surface.get_width() - limit * (icon_dimensions[0] + (2 * space[0]))) / 2
-		scroll_bar_height_ratio = min(1, explorer_surface.get_height() / new_surface_height)
-		scroll_bar_height = explorer_surface.get_height() * scroll_bar_height_ratio
-		remaining_height = explorer_surface.get_height() - scroll_bar_height
-		extra_rows = max(0, ((len(units.keys()) // limit) + 2) - int(explorer_surface.get_height() / (icon_dimensions[1] + (3 * space[1]))))
-		section = remaining_height / extra_rows if extra_rows != 0 else 0
-		scroll_bar_y = section * scroll
-
-		icons_surface = pygame.Surface((explorer_surface.get_width(), new_surface_height), pygame.SRCALPHA)
-		icons_surface.fill((0, 0, 0, 0))
-
-		count = 0
-
-		render_last = None
-		# render_last_count = 0
-		selected = list(filter(lambda unit: units[unit], units))
-		if len(selected) == 1:
-			render_last = selected[0]
+		# Only the visible rows get rendered, so the cost does not depend on how many units there are.
+		render_last = next(iter(selected)) if len(selected) == 1 else None
+		render_last_index = None
 
-		for unit in units:
-			if unit == render_last: 
-				render_last_count = count
-				count += 1
+		for index in grid.visible_range(len(units), scroll):
+			unit = units[index]
+			if unit is render_last:
+				render_last_index = index
 				continue
-			row = count // limit
-			col = count % limit
 
 			if isinstance(unit, File): path = file_icon_path
 			else: path = folder_icon_path
 
-			self.display_icon(icons_surface, unit, row, col, icon_dimensions, space, path, units[unit])
-
-			count += 1
+			self.display_icon(explorer_surface, unit, grid.position(index, scroll), icon_dimensions, space, path, unit in selected)
 	
-		if render_last:
-			row = render_last_count // limit
-			col = render_last_count % limit
-
+		if render_last_index is not None:
 			if isinstance(render_last, File): path = file_icon_path
 			else: path = folder_icon_path
 
-			self.display_icon(icons_surface, render_last, row, col, icon_dimensions, space, path, units[render_last], full_name=True)
+			self.display_icon(explorer_surface, render_last, grid.position(render_last_index, scroll), icon_dimensions, space, path, True, full_name=True)
 
-		explorer_surface.blit(icons_surface, (0, -(scroll * (icon_dimensions[1] + (3 * space[1])))))
-		self.conn_pygame_graphics.draw_rect((205, 205, 205), limit * (icon_dimensions[0] + (2 * space[0])) + scroll_bar_width, scroll_bar_y, scroll_bar_width, scroll_bar_height, surface=explorer_surface)
+		self.conn_pygame_graphics.draw_rect((205, 205, 205), *grid.scroll_bar(len(units), scroll), surface=explorer_surface)
 		surface.blit(explorer_surface, (0, titlebar_height))
 
-	def display_icon(self, surface, unit, row, col, icon_dimensions, space, path, selected, full_name=False):
+	def display_icon(self, surface, unit, pos, icon_dimensions, space, path, selected, full_name=False):
+		surface.blit(self.icon_block(unit, icon_dimensions, space, path, selected, full_name), pos)
+
+	def icon_block(self, unit, icon_dimensions, space, path, selected, full_name=False):
+		"""Returns the rendered block (icon, name and selection background) of a unit, reusing it until the unit is renamed."""
+
+		key = (unit, selected, full_name)
+		cached = self.icon_blocks.get(key)
+		if cached and cached[0] == (unit.get_name(), path, tuple(icon_dimensions), tuple(space)):
+			self.icon_blocks.move_to_end(key)
+			return cached[1]
+
+		block = self.render_icon_block(unit, icon_dimensions, space, path, selected, full_name)
+		self.icon_blocks[key] = ((unit.get_name(), path, tuple(icon_dimensions), tuple(space)), block)
+		self.icon_blocks.move_to_end(key)
+		if len(self.icon_blocks) > self.icon_block_capacity:
+			self.icon_blocks.popitem(last=False)
+		return block
+
+	def render_icon_block(self, unit, icon_dimensions, space, path, selected, full_name=False):
 		name = unit.get_name()
-		x = col * (icon_dimensions[0] + (2 * space[0]))
-		y = row * (icon_dimensions[1] + (3 * space[1]))
 		name_attr = (space[0] + icon_dimensions[0] / 2, icon_dimensions[1] + space[1] + space[1] / 3)
 		fontsize = 12
 
@@ -120,8 +116,7 @@ class Graphics(object):
 		block = pygame.Surface((icon_dimensions[0] + (2 * space[0]), icon_dimensions[1] + (3 * space[1])), pygame.SRCALPHA)
 		block.fill(color)
 
-		image = self.conn_pygame_graphics.convert_to_pygame_image(path)
-		image = pygame.transform.scale(image, icon_dimensions)
+		image = self.conn_pygame_graphics.scaled_image(path, icon_dimensions)
 		
 		if not full_name:
 			self.conn_pygame_graphics.blit_image(space, image, icon_dimensions[1], icon_dimensions[0], True, 0b0000, block)
@@ -185,14 +180,16 @@ class Graphics(object):
 				self.conn_pygame_graphics.render_text('regular', fontsize, line, (255, 255, 255), point=(name_attr[0], text_y), background=None, alignment=0b1000, surface=block)
 				text_y += fontsize
 
-		surface.blit(block, (x, y))
+		return block
 
 	def display_terminal_text(self, surface, text):
 		text_surface = pygame.Surface((surface.get_width(), surface.get_height() - titlebar_height), pygame.SRCALPHA)
 		text_surface.fill((0, 0, 0, 0))
 
+		size = text.get_font_size_scaled()
+		advance = text.get_font_size() * text.scale_factor * 3 / 5
 		for string in text.processed:
-			self.conn_pygame_graphics.render_text(string[1], text.get_font_size_scaled(), string[0], string[2], string[3], surface=text_surface)
+			self.conn_pygame_graphics.render_monospace_text(string[1], size, string[0], string[2], string[3], advance, surface=text_surface)
 
 		surface.blit(text_surface, (0, titlebar_height))
 
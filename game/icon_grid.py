@@ -0,0 +1,76 @@
+import math
+import pygame
+
+
+class IconGrid(object):
+	"""Layout of a scrollable grid of icons, shared by rendering and click hit-testing.
+
+	Scrolling is done in whole rows. Only the rows inside the viewport (plus an overscan) ever need to be rendered.
+
+	Attributes:
+		width -- width of the viewport.
+		height -- height of the viewport.
+		cell_width -- width of a single icon block.
+		cell_height -- height of a single icon block.
+		columns -- number of icons in a row.
+		overscan -- number of extra rows rendered above and below the viewport.
+	"""
+
+	def __init__(self, width, height, icon_dimensions, space, overscan=1):
+		"""
+		Arguments:
+			width -- width of the viewport.
+			height -- height of the viewport.
+			icon_dimensions -- width and height of the icon images.
+			space -- horizontal and vertical spacing around the icon images.
+			overscan -- number of extra rows rendered above and below the viewport.
+		"""
+
+		self.width = width
+		self.height = height
+		self.cell_width = icon_dimensions[0] + (2 * space[0])
+		self.cell_height = icon_dimensions[1] + (3 * space[1])
+		self.columns = max(1, width // self.cell_width)
+		self.overscan = overscan
+
+	def content_rows(self, count):
+		"""Returns the number of rows the grid scrolls through, including the padding row at the bottom."""
+
+		return (count // self.columns) + 2
+
+	def max_scroll(self, count):
+		"""Returns the furthest the grid can be scrolled, in rows."""
+
+		content_height = self.cell_height * self.content_rows(count)
+		if content_height < self.height: return 0
+		return (content_height - self.height) // self.cell_height + 1
+
+	def visible_range(self, count, scroll):
+		"""Returns the range of indices of the icons in the visible rows and the overscan."""
+
+		first_row = max(0, scroll - self.overscan)
+		last_row = scroll + math.ceil(self.height / self.cell_height) + self.overscan
+		return range(min(count, first_row * self.columns), min(count, last_row * self.columns))
+
+	def position(self, index, scroll):
+		"""Returns the top left point of the icon at index, relative to the viewport."""
+
+		row, col = divmod(index, self.columns)
+		return (col * self.cell_width, (row - scroll) * self.cell_height)
+
+	def index_at(self, x, y, count, scroll):
+		"""Returns the index of the icon under a point relative to the viewport, or None if there is none."""
+
+		col = int(x // self.cell_width)
+		if x < 0 or y < 0 or col >= self.columns: return None
+		index = int((y // self.cell_height) + scroll) * self.columns + col
+		return index if index < count else None
+
+	def scroll_bar(self, count, scroll):
+		"""Returns the rect of the scroll bar drawn to the right of the icons."""
+
+		bar_width = (self.width - self.columns * self.cell_width) / 2
+		bar_height = self.height * min(1, self.height / (self.cell_height * self.content_rows(count)))
+		extra_rows = max(0, self.content_rows(count) - int(self.height / self.cell_height))
+		section = (self.height - bar_height) / extra_rows if extra_rows != 0 else 0
+		return pygame.Rect(self.columns * self.cell_width + bar_width, section * scroll, bar_width, bar_height)
@@ -0,0 +1,127 @@
+import asyncio
+import inspect
+import time
+
+from collections import deque
+from custom_logging.logging import get_logger
+from exceptions.applications import TerminalCommandError
+
+
+logger = get_logger('game')
+
+
+class Job(object):
+	"""A Terminal command running as an asyncio task owned by the Terminal.
+
+	Output lines are buffered until the Terminal prints them, which it only does while the Job is in the
+	foreground. Commands streaming their output run in slices and give the event loop (and with it the
+	frame scheduler) a turn between them, and can be stopped and resumed between slices. Commands that are
+	plain coroutines run until they finish or are killed.
+
+	Attributes:
+		number -- Job number, as used by fg, bg and kill.
+		command_line -- Command line the Job runs.
+		output -- Buffered output lines. Once full, the oldest lines are dropped.
+		state -- 'Running', 'Stopped' or 'Done'.
+		exit_code -- Exit code once the Job is done.
+		error -- Error message once the Job is done, if it failed.
+		reported -- Whether the Terminal has told that the Job is done.
+	"""
+
+	def __init__(self, number, command_line, command, buffer_size=1000, time_slice=0.002):
+		"""
+		Arguments:
+			number -- Job number.
+			command_line -- Command line the Job runs.
+			command -- Async generator yielding the output lines, or coroutine, of the command.
+			buffer_size -- Number of output lines buffered.
+			time_slice -- Seconds a streaming command runs for before giving other tasks a turn.
+		"""
+
+		self.number = number
+		self.command_line = command_line
+		self.output = deque(maxlen=buffer_size)
+		self.time_slice = time_slice
+
+		self.state = 'Running'
+		self.exit_code = None
+		self.error = None
+		self.reported = False
+
+		self.resumed = asyncio.Event()
+		self.resumed.set()
+		self.command = command
+		self.task = asyncio.ensure_future(self.run(command))
+		self.task.add_done_callback(self.task_done)
+
+	def __str__(self):
+		status = self.state if self.state != 'Done' or not self.exit_code else f'Exit {self.exit_code}'
+		return f'[{self.number}]  {status:<10}{self.command_line}'
+
+	@property
+	def done(self):
+		return self.state == 'Done'
+
+	@property
+	def stoppable(self):
+		# Plain coroutines have no point to stop at, so they would only look Stopped while they kept running.
+		return inspect.isasyncgen(self.command)
+
+	async def run(self, command):
+		try:
+			if inspect.isasyncgen(command):
+				await self.stream(command)
+			else:
+				await command
+			self.finish(0)
+		except TerminalCommandError as e:
+			self.finish(1, e.message)
+		except asyncio.CancelledError:
+			if inspect.isasyncgen(command): await command.aclose()
+			else: command.close()
+			self.finish(130)
+
+	async def stream(self, command):
+		deadline = time.perf_counter() + self.time_slice
+		async for line in command:
+			# None means the command has nothing ready yet, e.g. a Pipeline waiting on its stages.
+			if line is None:
+				await asyncio.sleep(0)
+			else:
+				self.output.append(line)
+
+			if time.perf_counter() >= deadline or not self.resumed.is_set():
+				await asyncio.sleep(0)
+				await self.resumed.wait()
+				deadline = time.perf_counter() + self.time_slice
+
+	def task_done(self, task):
+		# Covers a Job killed before it got to start, and commands crashing.
+		if self.done: return
+		if task.cancelled():
+			if inspect.iscoroutine(self.command): self.command.close()
+			self.finish(130)
+		else:
+			logger.error(f'Job {self.number} ({self.command_line}) crashed: {task.exception()!r}')
+			self.finish(1, 'Command crashed.')
+
+	def finish(self, exit_code, error=None):
+		self.state = 'Done'
+		self.exit_code = exit_code
+		self.error = error
+		logger.debug(f'Job {self.number} ({self.command_line}) finished with exit code {exit_code}.')
+
+	def stop(self):
+		if self.done or not self.stoppable: return
+		self.state = 'Stopped'
+		self.resumed.clear()
+
+	def resume(self):
+		if self.done: return
+		self.state = 'Running'
+		self.resumed.set()
+
+	def kill(self):
+		if self.done: return
+		self.resumed.set()
+		self.task.cancel()
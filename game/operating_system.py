@@ -1,7 +1,9 @@
-import asyncio
 import pygame
+import asyncio
 import json
 
+from collections import Counter
+
 from custom_logging.logging import get_logger
 from game.application import TerminalApplication
 from game.applications.desktop_manager import DesktopManager
@@ -10,6 +12,9 @@ from game.applications.terminal import Terminal
 from game.applications.vim import PilotTextEditor
 from game.storage_system.directory import Directory
 from game.storage_system.file import File
+from game.storage_system.index import FileSystemIndex
+from game.storage_system.path_cache import PathCache
+from game.constants import file_system_index, file_contents_index, path_cache_size
 from exceptions.storage_system import SUPathError
 from utils.storage_system_parser import parse_root
 
@@ -23,6 +28,8 @@ class OperatingSystem(object):
 		self.memory_being_used = 0
 		with open('res/dev/root.json', 'r') as f:
 			self.root = parse_root(json.load(f))
+		if file_system_index: self.root.index = FileSystemIndex(self.root, contents_indexed=file_contents_index)
+		self.path_cache = PathCache(path_cache_size)
 		self.modifiers = {
 			"shift": False,
 			"alt": False,
@@ -53,13 +60,15 @@ class OperatingSystem(object):
 		}
 
 		self.master_application = None
+		# How many applications have each Directory as their current_dir.
+		self.open_directories = Counter()
 
-	async def run_main_loop(self):
-		logger.info('Starting Main Loop...')
-		while True:
-			await asyncio.sleep(0)
-			self.handle_events()
-			await self.master_application.run()
+	async def update(self):
+		"""Hands the pending events to the applications and runs them. Returns whether there were any events."""
+
+		events = self.handle_events()
+		await self.master_application.run()
+		return bool(events)
 
 	async def initialize(self):
 		self.start_application('DESKTOP', self)
@@ -76,11 +85,13 @@ class OperatingSystem(object):
 
 	async def make_dir(self, name, contents, parent):
 		dr = Directory(name, [], parent)
-		for content in contents:
+		# The contents may change while other tasks get a turn between Directories, so a snapshot is copied.
+		for content in list(contents):
 			if isinstance(content, Directory):
 				await self.make_dir(content.get_name(), content.get_contents(), dr)
 			else:
 				await self.make_file(content.get_name(), content.get_contents(), dr)
+		await asyncio.sleep(0)
 		parent.add(dr)
 		return dr
 
@@ -91,8 +102,16 @@ class OperatingSystem(object):
 				logger.info('Exiting Application...')
 				pygame.quit()
 				exit()
+			if event.type == pygame.KEYDOWN and event.key == pygame.K_F12:
+				self.system.graphics.conn_pygame_graphics.toggle_damage_overlay()
+
+			self.master_application.event_queue.append(event)
+			# Pasting hands the clipboard to the applications as a single TEXTINPUT event, inserted in one go.
+			if event.type == pygame.KEYDOWN and event.key == pygame.K_v and event.mod & pygame.KMOD_CTRL:
+				text = self.system.graphics.conn_pygame_graphics.get_clipboard_text()
+				if text: self.master_application.event_queue.append(pygame.event.Event(pygame.TEXTINPUT, text=text))
 
-		self.master_application.event_queue += events
+		return events
 
 	def start_application(self, name, os, master_app=None, headless=False, *args, **kwargs):
 		app = self.applications[name]['class'](self, os, *args, **kwargs)
@@ -114,13 +133,23 @@ class OperatingSystem(object):
 				raise Exception()  # Wrong OS instance / Machine
 		else:
 			self.master_application = app
+		# Only counted once nothing can reject the application any more.
+		app.hold_current_dir()
 		return app
 
+	def directory_opened(self, directory):
+		self.open_directories[directory] += 1
+
+	def directory_closed(self, directory):
+		self.open_directories[directory] -= 1
+		if self.open_directories[directory] <= 0: del self.open_directories[directory]
+
 	def su_open_in_app(self, su):
-		for app in self.applications:
-			for instance in self.applications[app]['instances']:
-				if su == instance.current_dir or (isinstance(su, Directory) and su.has_su(instance.current_dir)):
-					return True
+		"""Checks if a storage unit is, or is above, the current_dir of an application."""
+
+		for directory in self.open_directories:
+			if su is directory or (isinstance(su, Directory) and su.is_ancestor_of(directory)):
+				return True
 		return False
 
 	def parse_path(self, path, relative_to=None, parent_dir=False):
@@ -130,6 +159,11 @@ class OperatingSystem(object):
 		path = path.strip()	
 
 		if path in ['', '/']: return self.root
+		# Absolute paths resolve the same whatever they are relative to.
+		key = (path, None if path[0] == '/' else relative_to, parent_dir)
+		cached = self.path_cache.get(key)
+		if cached: return cached
+
 		path = path.split('/')
 		if path[-1] == '':
 			path.pop()
@@ -145,15 +179,20 @@ class OperatingSystem(object):
 
 		if parent_dir: path = path[:-1]
 
+		# The Directories the path goes through, whose generations tell when the result is stale.
+		directories = []
 		for part in path:
 			if part == '..':
 				if current == self.root:
 					raise SUPathError(original, 'Cannot go further back than the root Directory.')
+				# A File was reached through its parent, which is already in the Directories.
+				if isinstance(current, Directory): directories.append(current)
 				current = current.get_parent()
 			elif part == '.':
 				continue
 			else:
 				try:
+					directories.append(current)
 					current = current.get_su_by_name(part)
 					if not current: raise SUPathError(original, 'Path not found.')
 				except AttributeError:
@@ -163,4 +202,42 @@ class OperatingSystem(object):
 			if not isinstance(current, checktype):
 				raise SUPathError(original, 'Path not found.')
 
+		self.path_cache.put(key, current, directories)
 		return current
+
+	def resolve_paths(self, paths, relative_to=None, parent_dir=False):
+		"""Resolves many paths at once, for commands taking many of them.
+
+		Paths in the same Directory share its resolution, so only their last part is looked up for each of them.
+		Returns a list with, for every path, the storage unit it leads to (or its parent Directory, with parent_dir),
+		or the SUPathError resolving it raised.
+		"""
+
+		parents = {}
+		results = []
+		for path in paths:
+			head, slash, name = path.strip().rpartition('/')
+			if name in ['', '.', '..']:
+				try:
+					results.append(self.parse_path(path, relative_to, parent_dir))
+				except SUPathError as e:
+					results.append(e)
+				continue
+
+			head = f'{head}/' if slash else ''
+			if head not in parents:
+				try:
+					parents[head] = self.parse_path(head, relative_to) if head else relative_to
+				except SUPathError as e:
+					parents[head] = e
+			parent = parents[head]
+
+			if isinstance(parent, SUPathError):
+				results.append(SUPathError(path, parent.message))
+			elif parent_dir:
+				results.append(parent)
+			else:
+				su = parent.get_su_by_name(name)
+				results.append(su if su else SUPathError(path, 'Path not found.'))
+
+		return results
@@ -0,0 +1,203 @@
+import asyncio
+import inspect
+import shlex
+
+from custom_logging.logging import get_logger
+from exceptions.applications import TerminalCommandError
+from exceptions.storage_system import SUPathError, SUNameError, DirectoryElementError
+from game.storage_system.file import File
+
+
+logger = get_logger('game')
+
+# Put in a queue by a stage once it has no more output.
+END = object()
+
+
+def parse_command_line(command_line):
+	"""Splits a command line into its stages, an optional redirection and whether it runs in the background.
+
+	Returns (stages, redirect, background), where stages is a list of (command name, arguments), redirect is
+	None or a ('>' or '>>', path) tuple and background is True for a command line ending in '&'.
+	Quoted arguments keep their spaces.
+	"""
+
+	lexer = shlex.shlex(command_line, posix=True, punctuation_chars='|>&')
+	lexer.whitespace_split = True
+	# '#' is part of arguments like grep patterns, not the start of a comment.
+	lexer.commenters = ''
+	try:
+		tokens = list(lexer)
+	except ValueError as e:
+		raise TerminalCommandError('shell', f'Syntax error: {e}.')
+
+	background = tokens[-1:] == ['&']
+	if background: tokens.pop()
+
+	stages = [[]]
+	redirect = None
+	while tokens:
+		token = tokens.pop(0)
+		if token == '|':
+			if not stages[-1]: raise TerminalCommandError('shell', 'Syntax error near \'|\'.')
+			stages.append([])
+		elif token in ('>', '>>'):
+			if not tokens or tokens[0].startswith(('|', '>', '&')): raise TerminalCommandError('shell', f'Syntax error near \'{token}\'.')
+			if tokens[1:]: raise TerminalCommandError('shell', 'A redirection has to come last.')
+			redirect = (token, tokens.pop(0))
+		elif token.startswith(('|', '>', '&')):
+			raise TerminalCommandError('shell', f'Syntax error near \'{token}\'.')
+		else:
+			stages[-1].append(token)
+
+	if not stages[-1]:
+		if len(stages) > 1 or redirect or background: raise TerminalCommandError('shell', 'Missing command.')
+		return [], None, False
+	return [(stage[0], stage[1:]) for stage in stages], redirect, background
+
+
+def iter_lines(string):
+	"""Yields the lines of a string one at a time, without splitting all of it up front."""
+
+	start = 0
+	while True:
+		end = string.find('\n', start)
+		if end == -1:
+			yield string[start:]
+			return
+		yield string[start:end]
+		start = end + 1
+
+
+async def read_queue(queue):
+	"""Yields the lines put in a queue by the previous stage of a pipeline, until it ends."""
+
+	while True:
+		batch = await queue.get()
+		if batch is END: return
+		for line in batch:
+			yield line
+
+
+class Pipeline(object):
+	"""Commands of a Terminal connected with pipes, and optionally redirected to a File.
+
+	Every stage runs as its own task and sends its output lines to the next one, in batches, through a bounded
+	queue. A stage that gets ahead of the one reading its output waits for it, so at most queue_size batches per
+	stage are ever held in memory. Commands read their input from an async iterator passed as their stdin argument.
+
+	run() is streamed by a Job like any other command, and waits on the queue of the last stage for its output.
+	Redirected output is appended to the File as it arrives, in writes of at least write_size characters, so
+	redirecting holds no more in memory than printing does. run() yields None after every batch it writes, which
+	lets the Job be stopped while nothing gets printed.
+
+	Attributes:
+		terminal -- Terminal running the pipeline.
+		stages -- List of (command name, arguments).
+		redirect -- None, or a ('>' or '>>', path) tuple.
+		queue_size -- Number of batches a stage can get ahead of the next one.
+		batch_size -- Number of lines sent through a queue at once.
+		write_size -- Number of characters of redirected output gathered before they are appended to the File.
+		error -- First exception raised by a stage.
+	"""
+
+	def __init__(self, terminal, stages, redirect=None, queue_size=4, batch_size=64, write_size=65536):
+		self.terminal = terminal
+		self.stages = stages
+		self.redirect = redirect
+		self.queue_size = queue_size
+		self.batch_size = batch_size
+		self.write_size = write_size
+		self.error = None
+
+	@staticmethod
+	def reads_stdin(command):
+		return 'stdin' in inspect.signature(command).parameters
+
+	async def pump(self, generator, queue):
+		batch = []
+		try:
+			async for line in generator:
+				# None means the command gives other tasks a turn, like Job.stream() does for it outside pipelines.
+				if line is None:
+					await asyncio.sleep(0)
+					continue
+				batch.append(line)
+				# A partial batch is sent right away when the next stage is waiting for it.
+				if len(batch) == self.batch_size or queue.empty():
+					await queue.put(batch)
+					batch = []
+		except Exception as e:
+			# The stage still ends its output, so the stages after it do not wait on it forever.
+			if not self.error: self.error = e
+		if batch: await queue.put(batch)
+		await queue.put(END)
+
+	async def run(self):
+		target = await self.open_redirect() if self.redirect else None
+		# Redirected lines not appended to the File yet, and whether the next ones go on a new line of it.
+		pending = []
+		pending_size = 0
+		separate = bool(target and target.get_contents())
+		tasks = []
+		stdin = None
+
+		try:
+			for name, args in self.stages:
+				command = self.terminal.commands[name]
+				generator = command(args, stdin=stdin) if self.reads_stdin(command) else command(args)
+				queue = asyncio.Queue(self.queue_size)
+				tasks.append(asyncio.ensure_future(self.pump(generator, queue)))
+				stdin = read_queue(queue)
+
+			while True:
+				batch = await queue.get()
+				if batch is END: break
+				if not target:
+					for line in batch:
+						yield line
+					continue
+
+				pending.extend(batch)
+				pending_size += sum(len(line) + 1 for line in batch)
+				if pending_size >= self.write_size:
+					self.write(target, pending, separate)
+					pending = []
+					pending_size = 0
+					separate = True
+				yield None
+
+			if self.error: raise self.error
+
+		finally:
+			for task in tasks:
+				task.cancel()
+			if target and pending: self.write(target, pending, separate)
+
+	@staticmethod
+	def write(target, lines, separate):
+		"""Appends lines to the File target, after a newline when separate."""
+
+		text = '\n'.join(lines)
+		target.append(f'\n{text}' if separate else text)
+
+	async def open_redirect(self):
+		"""Returns the File the output is redirected to, making it if it does not exist yet."""
+
+		mode, path = self.redirect
+		os = self.terminal.os
+		try:
+			target = os.parse_path(path, self.terminal.current_dir)
+		except SUPathError:
+			name = path.split('/')[-1]
+			if not name: raise TerminalCommandError('shell', f'{path} is not a File.')
+			try:
+				parent = os.parse_path(path, self.terminal.current_dir, parent_dir=True)
+				target = await os.make_file(name, '', parent)
+			except (SUPathError, SUNameError, DirectoryElementError) as e:
+				raise TerminalCommandError('shell', e.message)
+
+		if not isinstance(target, File): raise TerminalCommandError('shell', f'{path} is not a File.')
+		if isinstance(target.get_contents(), bytes): raise TerminalCommandError('shell', f'Cannot redirect into the byte File {path}.')
+		if mode == '>': target.set_contents('')
+		return target
@@ -1,5 +1,8 @@
+import logging
+
+from bisect import bisect_left
+
 from custom_logging.logging import get_logger
-from utils import id_generator
 from exceptions.storage_system import *
 from game.storage_system.storage_unit import StorageUnit
 
@@ -16,9 +19,27 @@ class Directory(StorageUnit):
     Attributes:
         SUID -- ID of the directory.
         name -- string representing the name of the directory.
-        contents -- list containing the contents of the directory. 
+        contents -- list containing the contents of the directory, in the order they were added.
         parent -- Directory which this directory belongs to. 
+        generation -- number changing whenever the contents are added to, deleted from or renamed, or the
+            directory is moved, for caches of what depends on them to tell they are stale.
+
+    The contents are kept in a dictionary mapping their names to them, for looking up, adding and deleting
+    in O(1), and in a dictionary of their own for their order, which renaming does not change. The list of
+    the contents is only built again when it is asked for after a change.
+
+    The names of the contents are also kept sorted, for looking up the names starting with a prefix in
+    O(log n). Names added since the last lookup are kept in a dictionary and only merged in by the next one,
+    so adding, and deleting or renaming before then, stays O(1).
+
+    Every change gives the directory a generation newer than any other directory's, and latest_generation
+    is the newest one, so a cache can tell nothing at all changed since it last checked in O(1).
     """
+
+    __slots__ = ('generation', '_units', '_order', '_contents', '_sorted_names', '_unsorted_names')
+
+    latest_generation = 0
+    suid_prefix = 'DIR'
     
     def __init__(self, name, contents, parent):
         """InitializeS the directory using a name, contents and a parent.
@@ -29,79 +50,220 @@ class Directory(StorageUnit):
             parent -- parent of the directory.
         """
 
-        super().__init__(f'DIR-{id_generator.generate_id()}', name, contents, parent)
+        self.generation = 0
+        super().__init__(name, contents, parent)
 
-    def bfs(self, depth = 0):
+    def bfs(self):
         """Returns the contents of the directory in tree format"""
 
-        bfsstr = ''
-        
-        for su in self.get_contents():
-            bfsstr += '\n'
-            bfsstr += ('|    ' * depth)
-            bfsstr += ('| -- ')
-            bfsstr += su.get_name()
-        
+        return '\n'.join(self.tree_lines())
+
+    def tree_lines(self):
+        """Yields the lines of the tree of the directory's contents one at a time.
+
+        The tree is walked with an explicit stack instead of recursion, so it can be consumed lazily and
+        does not run into the recursion limit on deep trees.
+        """
+
+        stack = [(iter(self.get_contents()), 0)]
+        while stack:
+            contents, depth = stack[-1]
+            su = next(contents, None)
+            if su is None:
+                stack.pop()
+                continue
+
+            yield ('|    ' * depth) + '| -- ' + su.get_name()
+            if isinstance(su, Directory):
+                stack.append((iter(su.get_contents()), depth + 1))
+
+    def walk(self):
+        """Yields every storage unit under the directory, depth first and in the order of the contents."""
+
+        stack = [iter(self.get_contents())]
+        while stack:
+            su = next(stack[-1], None)
+            if su is None:
+                stack.pop()
+                continue
+
+            yield su
             if isinstance(su, Directory):
-                bfsstr += su.bfs(depth + 1)
-            
-        return bfsstr if depth != 0 else bfsstr[1:]
+                stack.append(iter(su.get_contents()))
 
     def has_su(self, su):
         """Checks if a storage unit belongs to this directory or any of its sub directories."""
 
-        for content in self.get_contents():
-            if content == su:
+        return self.is_ancestor_of(su)
+
+    def is_ancestor_of(self, su):
+        """Checks if the directory is above a storage unit, by walking up its parents, in O(depth)."""
+
+        parent = su.get_parent() if su else None
+        while parent:
+            if parent is self:
                 return True
-            if isinstance(content, Directory):
-                if content.has_su(su):
-                    return True
-        
+            parent = parent.get_parent()
+
         return False
 
+    @property
+    def contents(self):
+        if self._contents is None: self._contents = list(self._order)
+        return self._contents
+
     def add(self, su):
         """Adds a storage unit to the contents of the directory"""
 
         self._validate_directory_element(su)
-        self.contents.append(su)
+        index = self.get_index()
+        # Names and contents do not change on a move, so a storage unit moving within the indexed file system
+        # is not indexed again, however much is under it.
+        moved = bool(index) and su in index.units and self in index.units
+
+        self._units[su.get_name()] = su
+        self._order[su] = None
+        self._contents = None
+        self._unsorted_names[su.get_name()] = None
         if su.parent and su.parent != self:
-            su.parent.delete(su.get_name())
+            su.parent._take(su, unindex=not moved)
         su.set_parent(self)
+        self._changed()
+        if isinstance(su, Directory): su._changed()
+
+        if index and not moved: index.added(self, su)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Added {su.__class__.__name__} with ID {su.get_id()} and name {su.get_name()} to {self.__class__.__name__} with ID {self.SUID}')
+
+    def add_as(self, su, name):
+        """Adds a storage unit from another directory to the contents of the directory under a new name.
+
+        A storage unit moving within the indexed file system stays indexed, and only has its name updated in it.
+
+        Arguments:
+            su -- storage unit to move.
+            name -- name it gets in the directory.
+        """
+
+        su._validate_name(name)
+        if name in self._units:
+            raise DirectoryElementError(su, 'Directory cannot have duplicate elements')
 
-        logger.debug(f'Added {su.__class__.__name__} with ID {su.get_id()} and name {su.get_name()} to {self.__class__.__name__} with ID {self.SUID}')
+        # Taken out first, so a storage unit with the new name in its old directory does not get in the way.
+        index = self.get_index()
+        moved = bool(index) and su in index.units and self in index.units
+        old_name = su.get_name()
+        if su.parent: su.parent._take(su, unindex=not moved)
+        su.set_name(name)
+        self.add(su)
+        if moved: index.renamed(su, old_name)
 
     def delete(self, su_name):
         """Deleted a storage unit from the contents of the directory"""
 
         su = self.get_su_by_name(su_name)
         if su:
-            self.contents.remove(su)
-            su.set_parent(None)
-
-            logger.debug(f'Deleted {su.__class__.__name__} with ID {su.get_id()} and name {su.get_name()} from {self.__class__.__name__} with ID {self.SUID}')
+            self._take(su)
         else:
             logger.warning(f'No SU with name {su_name} in contents of {self.__class__.__name__} with ID {self.SUID}')
 
-    def get_path(self):
-        """Returns the Directory's absolute path"""
+    def _take(self, su, unindex=True):
+        """Takes a storage unit out of the contents, and out of the index unless it is moving within it."""
+
+        if unindex:
+            index = self.get_index()
+            if index: index.removed(su)
+        del self._units[su.get_name()]
+        del self._order[su]
+        self._contents = None
+        self._unindex_name(su.get_name())
+        su.set_parent(None)
+        self._changed()
+        if isinstance(su, Directory): su._changed()
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Deleted {su.__class__.__name__} with ID {su.get_id()} and name {su.get_name()} from {self.__class__.__name__} with ID {self.SUID}')
 
-        return f'{self.parent.get_path()}{self.get_name()}/'
+    def _build_path(self, parent_path):
+        """Returns the Directory's absolute path given the path of its parent."""
+
+        return f'{parent_path}{self.get_name()}/'
 
     def get_su_by_name(self, su_name):
         """Returns SU with the given name from contents."""
 
-        elements = list(filter(lambda su: su.get_name() == su_name, self.contents))
-        if len(elements) > 0:
-            return elements[0]
-        return
+        return self._units.get(su_name)
 
     def set_contents(self, contents):
         """Set contents fot the directory."""
 
         self._validate_contents(contents)
-        self.contents = contents
-
-        logger.debug(f'Set contents for {self.__class__.__name__} with id {self.SUID}')
+        index = self.get_index()
+        if index:
+            for su in getattr(self, '_order', ()):
+                index.removed(su)
+        self._units = {su.get_name(): su for su in contents}
+        self._order = dict.fromkeys(contents)
+        self._contents = None
+        if index:
+            for su in contents:
+                index.added(self, su)
+        self._sorted_names = sorted(su.get_name() for su in contents)
+        self._unsorted_names = {}
+        self._changed()
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Set contents for {self.__class__.__name__} with id {self.SUID}')
+
+    def get_names_starting_with(self, prefix):
+        """Returns the sorted names of the contents starting with prefix."""
+
+        if self._unsorted_names:
+            # Once sorted, in O(k log k), the k new names and the n sorted ones are two runs, which sort() merges in O(n + k).
+            self._sorted_names.extend(sorted(self._unsorted_names))
+            self._sorted_names.sort()
+            self._unsorted_names = {}
+
+        start = bisect_left(self._sorted_names, prefix)
+        end = bisect_left(self._sorted_names, prefix + '\U0010ffff', start)
+        return self._sorted_names[start:end]
+
+    def su_renamed(self, su, old_name):
+        """Updates the names of the contents after a storage unit in them got renamed."""
+
+        if self._units.get(old_name) is not su: return
+        del self._units[old_name]
+        self._units[su.get_name()] = su
+        self._unindex_name(old_name)
+        self._unsorted_names[su.get_name()] = None
+        self._changed()
+
+        index = self.get_index()
+        if index: index.renamed(su, old_name)
+
+    def get_index(self):
+        """Returns the FileSystemIndex of the file system the directory is in, if it has one."""
+
+        directory = self
+        while directory.parent:
+            directory = directory.parent
+        return directory.index if isinstance(directory, RootDir) else None
+
+    def _changed(self):
+        """Gives the directory a new generation, newer than every other one."""
+
+        Directory.latest_generation += 1
+        self.generation = Directory.latest_generation
+
+    def _unindex_name(self, name):
+        if name in self._unsorted_names:
+            del self._unsorted_names[name]
+            return
+
+        index = bisect_left(self._sorted_names, name)
+        if index < len(self._sorted_names) and self._sorted_names[index] == name:
+            del self._sorted_names[index]
 
     def _validate_contents(self, contents):
         """Raises approprite exception if directory contents are of invalid type."""
@@ -109,8 +271,13 @@ class Directory(StorageUnit):
         if not isinstance(contents, list):
             raise DirectoryContentsError(contents, 'Contents need to be of type list')
         
+        names = set()
         for element in contents:
-            self._validate_directory_element(element)
+            if not isinstance(element, StorageUnit):
+                raise DirectoryElementError(element, 'Element needs to be of type StorageUnit')
+            if element.get_name() in names:
+                raise DirectoryElementError(element, 'Directory cannot have duplicate elements')
+            names.add(element.get_name())
 
     def _validate_directory_element(self, su):
         """Raises appropriate exception if directory element is invalid"""
@@ -118,9 +285,15 @@ class Directory(StorageUnit):
         if not isinstance(su, StorageUnit):
             raise DirectoryElementError(su, 'Element needs to be of type StorageUnit')
 
-        if su.get_name() in [s.get_name() for s in self.contents]:
+        if su.get_name() in self._units:
             raise DirectoryElementError(su, 'Directory cannot have duplicate elements')
 
+    def _validate_su_rename(self, su, name):
+        """Raises appropriate exception if a storage unit in the contents can not be renamed to name."""
+
+        if self._units.get(name, su) is not su and self._units.get(su.get_name()) is su:
+            raise SUNameError(name, 'Directory already has a storage unit with that name')
+
 
 class RootDir(Directory):
     """Class representing the Root Directory.
@@ -129,9 +302,12 @@ class RootDir(Directory):
     It doesn't have a name or a parent.
     """
 
+    __slots__ = ('index',)
+
     def __init__(self, contents):
         """Initializes the root directory using contents."""
         
+        self.index = None
         super().__init__('', contents, None)
 
     def get_path(self):
@@ -1,5 +1,6 @@
+import logging
+
 from custom_logging.logging import get_logger
-from utils import id_generator
 from game.storage_system.storage_unit import StorageUnit
 from exceptions.storage_system import *
 
@@ -16,10 +17,16 @@ class File(StorageUnit):
     Attributes:
         SUID -- ID of the file.
         name -- string representing the name of the file.
+        filename -- name of the file without its extension.
+        extension -- extension of the file, or None if it has none.
         contents -- represent the contents of the file.
         parent -- Directory which the file belongs to.
     """
 
+    __slots__ = ('contents',)
+
+    suid_prefix = 'FILE'
+
     def __init__(self, name, contents, parent):
         """Initializes the file using name, contents and a parent.
         
@@ -29,17 +36,15 @@ class File(StorageUnit):
             parent -- Directory which the file belongs to.
         """
         
-        super().__init__(f'FILE-{id_generator.generate_id()}', name, contents, parent)
+        super().__init__(name, contents, parent)
 
-    def set_name(self, name):
-        """Splits name into filename and extension and stores them."""
+    @property
+    def filename(self):
+        return self.name.rpartition('.')[0] if '.' in self.name else self.name
 
-        self._validate_name(name)
-        namesplit = name.split('.')
-        self.filename = namesplit[0] if len(namesplit) == 1 else '.'.join(namesplit[0:-1])
-        self.extension = None if len(namesplit) == 1 else namesplit[-1]
-
-        logger.debug(f'Setting name for {self.__class__.__name__} with id {self.SUID} to "{name}"')
+    @property
+    def extension(self):
+        return self.name.rpartition('.')[2] if '.' in self.name else None
 
     def replace(self, old, new, count=None):
         """Replaces a part of the contents with something else.
@@ -55,13 +60,42 @@ class File(StorageUnit):
         if not (isinstance(old, str) and isinstance(new, str)):
             raise TypeError('Both arguments need to be of type str.', old, new)
 
+        contents = self.contents
         self.contents = self.contents.replace(old, new, count) if count else self.get_contents().replace(old, new)
-        logger.debug(f'Replaced "{old}" with "{new}" in the contents of {self.__class__.__name__} with id {self.SUID}.')
+        index = self.get_index()
+        if index: index.contents_changed(self, contents, self.contents)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Replaced "{old}" with "{new}" in the contents of {self.__class__.__name__} with id {self.SUID}.')
+
+    def append(self, contents):
+        """Adds contents to the end of the contents of the file.
+
+        Arguments:
+            contents -- What to add, of the same type (str or bytes) as the contents of the file.
+        """
+
+        if type(contents) != type(self.get_contents()):
+            raise TypeError('Appended contents need to be of the same type as the contents of the file.', contents)
+
+        old = self.contents
+        self.contents += contents
+        index = self.get_index()
+        if index: index.contents_appended(self, old, contents)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Appended {len(contents)} characters to the contents of {self.__class__.__name__} with id {self.SUID}.')
+
+    def set_contents(self, contents):
+        """Sets the contents of the file, keeping the index of its file system up to date."""
+
+        old = getattr(self, 'contents', None)
+        super().set_contents(contents)
+        index = self.get_index()
+        if index: index.contents_changed(self, old, contents)
 
-    def get_name(self):
-        """Returns the name of the file."""
+    def get_index(self):
+        """Returns the FileSystemIndex of the file system the file is in, if it has one."""
 
-        return f'{self.filename}.{self.extension}' if self.extension else self.filename
+        return self.parent.get_index() if self.parent else None
 
     def _validate_contents(self, contents):
         """Raises appropriate exception if file contents are of invalid type."""
@@ -0,0 +1,205 @@
+from fnmatch import filter as fnfilter
+from custom_logging.logging import get_logger
+
+
+logger = get_logger('game')
+
+# Characters after which nothing more is known about the text a pattern matches.
+_METACHARACTERS = '.^$+[]()'
+
+
+def trigrams(text):
+    """Returns the set of the three character substrings of text."""
+
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def required_literals(pattern):
+    """Returns substrings any text matching the regular expression pattern has to contain.
+
+    This is conservative: patterns it does not understand (alternation, groups) give no literals at all.
+    """
+
+    if '|' in pattern or '(' in pattern: return []
+
+    literals = []
+    run = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            literals.append(''.join(run))
+            run = []
+            index += 2
+            continue
+        if char in '*?{':
+            # The character before is optional.
+            if run: run.pop()
+            literals.append(''.join(run))
+            run = []
+            if char == '{':
+                end = pattern.find('}', index)
+                index = len(pattern) if end == -1 else end
+        elif char == '[':
+            literals.append(''.join(run))
+            run = []
+            end = pattern.find(']', index + 2)
+            index = len(pattern) if end == -1 else end
+        elif char in _METACHARACTERS:
+            literals.append(''.join(run))
+            run = []
+        else:
+            run.append(char)
+        index += 1
+
+    literals.append(''.join(run))
+    return [literal for literal in literals if literal]
+
+
+class FileSystemIndex(object):
+    """Index of the storage units of a file system, kept up to date as it changes.
+
+    Storage units are indexed by name, and Files with text contents optionally by the trigrams of their contents.
+    The storage system tells the index about every change through added(), removed(), renamed() and
+    contents_changed(), and it only indexes what is attached to its root.
+
+    Attributes:
+        root -- RootDir of the indexed file system.
+        units -- set of the indexed storage units.
+        names -- dictionary mapping a name to the set of storage units with that name.
+        contents_indexed -- whether the contents of Files are indexed.
+        trigrams -- dictionary mapping a trigram to the set of Files with text contents containing it.
+    """
+
+    def __init__(self, root, contents_indexed=True):
+        """Indexes the file system under root.
+
+        Arguments:
+            root -- RootDir of the file system to index.
+            contents_indexed -- whether to keep a trigram index of the contents of Files.
+        """
+
+        self.root = root
+        self.units = {root}
+        self.names = {}
+        self.contents_indexed = contents_indexed
+        self.trigrams = {}
+
+        for su in root.get_contents():
+            self._add_tree(su)
+
+        logger.debug(f'Indexed {len(self.units)} storage units.')
+
+    def added(self, parent, su):
+        """Indexes a storage unit, and everything under it, added to parent."""
+
+        if parent in self.units: self._add_tree(su)
+
+    def removed(self, su):
+        """Removes a storage unit, and everything under it, from the index."""
+
+        if su in self.units: self._remove_tree(su)
+
+    def renamed(self, su, old_name):
+        if su not in self.units: return
+        self._unindex_name(su, old_name)
+        self.names.setdefault(su.get_name(), set()).add(su)
+
+    def contents_changed(self, file, old, new):
+        """Updates the trigrams of a File whose contents changed from old to new."""
+
+        if not self.contents_indexed or file not in self.units: return
+        self._unindex_contents(file, old)
+        self._index_contents(file, new)
+
+    def contents_appended(self, file, old, appended):
+        """Adds the trigrams of contents appended to a File, without going over its old contents again."""
+
+        if not self.contents_indexed or file not in self.units: return
+        if isinstance(appended, str) and isinstance(old, str):
+            self._index_contents(file, old[-2:] + appended)
+
+    @staticmethod
+    def is_under(su, directory):
+        """Checks if a storage unit is directory or anywhere under it."""
+
+        return su is directory or directory.is_ancestor_of(su)
+
+    def find(self, pattern, under=None):
+        """Returns the indexed storage units whose name matches the glob pattern.
+
+        Arguments:
+            pattern -- glob pattern, as understood by fnmatch.
+            under -- (optional) Directory the storage units need to be in, at any depth.
+        """
+
+        if not any(char in pattern for char in '*?['):
+            units = set(self.names.get(pattern, ()))
+        else:
+            units = set()
+            for name in fnfilter(self.names, pattern):
+                units.update(self.names[name])
+        if under and under is not self.root:
+            units = {su for su in units if self.is_under(su, under)}
+        return units
+
+    def grep_candidates(self, pattern):
+        """Returns the Files which may contain text matching the regular expression pattern.
+
+        Returns None when the index can not narrow them down, in which case every File needs to be searched.
+        """
+
+        if not self.contents_indexed: return None
+        grams = set()
+        for literal in required_literals(pattern):
+            grams |= trigrams(literal)
+        if not grams: return None
+
+        candidates = None
+        for gram in sorted(grams, key=lambda gram: len(self.trigrams.get(gram, ()))):
+            files = self.trigrams.get(gram)
+            if not files: return set()
+            candidates = set(files) if candidates is None else candidates & files
+            if not candidates: break
+        return candidates
+
+    def _add_tree(self, su):
+        stack = [su]
+        while stack:
+            su = stack.pop()
+            self.units.add(su)
+            self.names.setdefault(su.get_name(), set()).add(su)
+            if isinstance(su.get_contents(), list):
+                stack.extend(su.get_contents())
+            elif self.contents_indexed:
+                self._index_contents(su, su.get_contents())
+
+    def _remove_tree(self, su):
+        stack = [su]
+        while stack:
+            su = stack.pop()
+            self.units.discard(su)
+            self._unindex_name(su, su.get_name())
+            if isinstance(su.get_contents(), list):
+                stack.extend(su.get_contents())
+            elif self.contents_indexed:
+                self._unindex_contents(su, su.get_contents())
+
+    def _unindex_name(self, su, name):
+        units = self.names.get(name)
+        if not units: return
+        units.discard(su)
+        if not units: del self.names[name]
+
+    def _index_contents(self, file, contents):
+        if not isinstance(contents, str): return
+        for gram in trigrams(contents):
+            self.trigrams.setdefault(gram, set()).add(file)
+
+    def _unindex_contents(self, file, contents):
+        if not isinstance(contents, str): return
+        for gram in trigrams(contents):
+            files = self.trigrams.get(gram)
+            if not files: continue
+            files.discard(file)
+            if not files: del self.trigrams[gram]
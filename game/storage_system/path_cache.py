@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from game.storage_system.directory import Directory
+
+
+class PathCache(object):
+    """Least recently used cache of resolved paths.
+
+    Every entry keeps the Directories the path was resolved through along with their generation at the time.
+    A Directory's generation goes up whenever its contents are added to, deleted from or renamed, and whenever
+    it is moved, so an entry is still valid as long as none of those generations changed. Nothing needs to be
+    evicted when the file system changes: stale entries are found out on their next lookup.
+
+    Entries also remember the latest generation of any Directory when they were last found valid. While no
+    Directory changed since, which is most of the time, a lookup is a single dictionary hit.
+
+    Attributes:
+        maxsize -- how many paths are kept before the least recently used one is dropped.
+        entries -- OrderedDict mapping a key to a list of the storage unit it resolved to, its Directories, their
+            generations and the latest generation it was found valid at.
+    """
+
+    def __init__(self, maxsize=1024):
+        """Initializes an empty cache.
+
+        Arguments:
+            maxsize -- (optional) how many paths to keep.
+        """
+
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """Returns the storage unit key resolved to, or None if it is not cached or no longer valid."""
+
+        entry = self.entries.get(key)
+        if entry is None: return None
+
+        su, directories, generations, checked = entry
+        if checked != Directory.latest_generation:
+            if tuple(directory.generation for directory in directories) != generations:
+                del self.entries[key]
+                return None
+            entry[3] = Directory.latest_generation
+
+        self.entries.move_to_end(key)
+        return su
+
+    def put(self, key, su, directories):
+        """Caches the storage unit key resolved to.
+
+        Arguments:
+            key -- key the storage unit is looked up with.
+            su -- storage unit the path resolved to.
+            directories -- Directories the resolution depended on.
+        """
+
+        directories = tuple(directories)
+        generations = tuple(directory.generation for directory in directories)
+        self.entries[key] = [su, directories, generations, Directory.latest_generation]
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drops every cached path."""
+
+        self.entries.clear()
@@ -1,3 +1,8 @@
+import logging
+
+from itertools import count
+from sys import intern
+
 from custom_logging.logging import get_logger
 from exceptions.storage_system import *
 
@@ -13,48 +18,77 @@ class StorageUnit(object):
     It can be used either as a File or a Directory.
 
     Attributes:
-        SUID -- ID of the storage unit.
+        node_id -- integer ID of the storage unit, unique among every storage unit made.
+        SUID -- string ID of the storage unit, made from node_id when asked for.
         name -- string representing the name of the storage unit.
         contents -- the contents of the storage unit. 
         parent -- Directory which the storage unit belongs to.       
+
+    Storage units keep their attributes in __slots__ rather than a __dict__ and their names are interned, so that
+    file systems with millions of them stay small.
+
+    The absolute path is cached once built. Renaming or moving any storage unit whose path has been built moves
+    path_epoch on, after which every cached path is checked again on its next read: it is only built again when
+    the path of its parent changed, which is told apart by the identity of the parent's path string. Moving a
+    Directory thus stays O(1) however many storage units are under it.
     """
 
-    def __init__(self, suid, name, contents, parent):
+    __slots__ = ('node_id', 'name', 'parent', '_path', '_parent_path', '_path_epoch')
+
+    path_epoch = 0
+    suid_prefix = 'SU'
+    _node_ids = count(1)
+
+    def __init__(self, name, contents, parent):
         """Initializes StorageUnit using name, contents and a parent.
         
         Arguments:
-            suid -- ID of the storage unit.
             name -- name of the storage unit.
             contents -- contents of the storage unit.
             parent -- Directory which the storage unity belongs to.
         """
 
-        self.SUID = suid
+        self.node_id = next(StorageUnit._node_ids)
+        self._path = None
+        self._parent_path = None
+        self._path_epoch = -1
 
         self.set_name(name)
         self.set_parent(parent)
         self.set_contents(contents)
 
-        logger.debug(f'Initialized {self.__class__.__name__} with id {self.SUID}.')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Initialized {self.__class__.__name__} with id {self.SUID}.')
 
     def __str__(self):
         return self.get_name()
 
+    @property
+    def SUID(self):
+        return f'{self.suid_prefix}-{self.node_id}'
+
     def set_name(self, name):
         """Sets the name attribute of the class"""
         
         self._validate_name(name)
-        self.name = name
+        old_name = getattr(self, 'name', None)
+        if old_name is not None: self._validate_rename(name)
+        self.name = intern(name)
+        self._path_changed()
+        if old_name is not None: self._renamed(old_name)
 
-        logger.debug(f'Set name for {self.__class__.__name__} with id {self.SUID} to {name}.')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Set name for {self.__class__.__name__} with id {self.SUID} to {name}.')
 
     def set_parent(self, parent):
         """Sets the parent attribute of the class"""
 
         self._validate_parent(parent)
         self.parent = parent
+        self._path_changed()
 
-        logger.debug(f'Set parent for {self.__class__.__name__} with id {self.SUID} to {parent}')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Set parent for {self.__class__.__name__} with id {self.SUID} to {parent}')
 
     def set_contents(self, contents):
         """Sets the contents attribute of the class"""
@@ -62,7 +96,28 @@ class StorageUnit(object):
         self._validate_contents(contents)
         self.contents = contents
 
-        logger.debug(f'Modified contents for {self.__class__.__name__} with id {self.SUID}.')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Modified contents for {self.__class__.__name__} with id {self.SUID}.')
+
+    def _validate_rename(self, name):
+        """Raises appropriate exception if the parent already has another storage unit with that name."""
+
+        parent = getattr(self, 'parent', None)
+        if parent: parent._validate_su_rename(self, name)
+
+    def _path_changed(self):
+        """Marks the path as to be built again, along with those under it if they may have been cached."""
+
+        self._parent_path = None
+        self._path_epoch = -1
+        if self._path is not None:
+            StorageUnit.path_epoch += 1
+
+    def _renamed(self, old_name):
+        """Lets the parent know the storage unit was renamed."""
+
+        parent = getattr(self, 'parent', None)
+        if parent and old_name != self.get_name(): parent.su_renamed(self, old_name)
 
     def get_id(self):
         """Returns the SUID"""
@@ -87,7 +142,19 @@ class StorageUnit(object):
     def get_path(self):
         """Returns the SU's absolute path"""
 
-        return f'{self.parent.get_path()}{self.get_name()}'
+        if self._path_epoch == StorageUnit.path_epoch: return self._path
+
+        parent_path = self.parent.get_path()
+        if parent_path is not self._parent_path:
+            self._path = self._build_path(parent_path)
+            self._parent_path = parent_path
+        self._path_epoch = StorageUnit.path_epoch
+        return self._path
+
+    def _build_path(self, parent_path):
+        """Returns the SU's absolute path given the path of its parent."""
+
+        return f'{parent_path}{self.get_name()}'
 
     def _validate_name(self, name):
         """Raises appropriate exception if name is invalid."""
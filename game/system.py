@@ -1,10 +1,10 @@
 import pygame
-import asyncio
 
 from custom_logging.logging import get_logger
 from utils.id_generator import generate_id
 from utils.ip_generator import generate_ip
 from game.graphics import Graphics
+from game.frame_scheduler import FrameScheduler
 
 
 logger = get_logger('game')
@@ -28,6 +28,8 @@ class System(object):
 			'not_found': 'Bootable Media not found...'
 		}
 
+		self.scheduler = FrameScheduler(self, self.graphics.conn_pygame_graphics.fps)
+
 		self.surface = self.graphics.get_system_surface()
 		self.graphics.outline_surface(self.surface, 'green', 1)
 
@@ -36,23 +38,12 @@ class System(object):
 	def get_ip(self):
 		return self.IP
 
-	def event_handler(self):
-		# self.os.handle_events()
-		pass
-
 	def graphics_handler(self):
-		self.graphics.conn_pygame_graphics.main(self.surface.ID)
+		self.graphics.conn_pygame_graphics.render()
 
-	async def run_loops(self):
+	async def run_loops(self, max_frames=None):
 		logger.info('Starting System Processes...')
-		await asyncio.gather(self.os.run_main_loop(), self.system_loop())
-
-	async def system_loop(self):
-		logger.info('Starting Main Loop...')
-		while True:
-			await asyncio.sleep(0)
-			self.event_handler()
-			self.graphics_handler()
+		await self.scheduler.run(max_frames)
 
 	async def install_os(self):
 		if not self.bootable_media:
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from custom_logging.logging import get_logger
+
+import pygame
+
+
+logger = get_logger('graphics')
+
+
+class AssetCache(object):
+	"""Keeps decoded images, converted to the display format, and their scaled variants in memory.
+
+	Entries are keyed by (path, size), where a size of None is the image at its original size.
+	Once the total size of the cached surfaces goes over the memory cap, the least recently used entries are evicted.
+	Surfaces handed out by the cache are shared, so they must not be drawn on.
+
+	Attributes:
+		base_path -- Directory the image paths are relative to.
+		memory_cap -- Maximum number of bytes of pixel data kept in the cache.
+		memory_used -- Number of bytes of pixel data currently in the cache.
+		hits -- Number of lookups served from the cache.
+		misses -- Number of lookups that had to load or scale an image.
+	"""
+
+	def __init__(self, base_path, memory_cap=64 * 1024 * 1024):
+		"""
+		Parameters:
+			base_path -- Directory the image paths are relative to.
+			memory_cap -- Maximum number of bytes of pixel data kept in the cache.
+		"""
+
+		self.base_path = base_path
+		self.memory_cap = memory_cap
+		self.memory_used = 0
+		self.hits = 0
+		self.misses = 0
+
+		self.entries = OrderedDict()
+
+	def load(self, path):
+		"""Returns the image at path, decoding it from disk only if it is not cached."""
+
+		return self.get(path, None)
+
+	def scaled(self, path, size):
+		"""Returns the image at path scaled to size (width, height)."""
+
+		return self.get(path, (int(size[0]), int(size[1])))
+
+	def get(self, path, size):
+		key = (path, size)
+		image = self.entries.get(key)
+		if image:
+			self.hits += 1
+			self.entries.move_to_end(key)
+			return image
+
+		if size:
+			original = self.load(path)
+			if original.get_size() == size:
+				return original
+			self.misses += 1
+			image = pygame.transform.scale(original, size)
+		else:
+			self.misses += 1
+			image = self.convert(pygame.image.load(self.base_path + path))
+
+		self.entries[key] = image
+		self.memory_used += self.get_memory(image)
+		self.evict(keep=key)
+		return image
+
+	def convert(self, image):
+		"""Converts an image to the pixel format of the display, keeping per pixel alpha if it has any."""
+
+		if not pygame.display.get_surface():
+			return image
+		if image.get_flags() & pygame.SRCALPHA or image.get_colorkey():
+			return image.convert_alpha()
+		return image.convert()
+
+	def evict(self, keep=None):
+		"""Evicts least recently used entries until the cache fits in its memory cap."""
+
+		while self.memory_used > self.memory_cap and len(self.entries) > 1:
+			key = next(iter(self.entries))
+			if key == keep:
+				self.entries.move_to_end(key)
+				continue
+			image = self.entries.pop(key)
+			self.memory_used -= self.get_memory(image)
+			logger.debug(f'Evicted {key} from the Asset Cache.')
+
+	def clear(self):
+		self.entries.clear()
+		self.memory_used = 0
+
+	@staticmethod
+	def get_memory(image):
+		return image.get_width() * image.get_height() * image.get_bytesize()
+
+	def stats(self):
+		"""Returns a dictionary with the hit/miss counters and memory usage of the cache."""
+
+		return { 'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'memory_used': self.memory_used, 'memory_cap': self.memory_cap }
@@ -1,6 +1,11 @@
 from logging import Logger
 from custom_logging.logging import get_logger
 from utils import id_generator
+from graphics.font_registry import FontRegistry
+from graphics.glyph_atlas import GlyphAtlasCache
+from graphics.asset_cache import AssetCache
+from graphics.layer_manager import LayerManager
+from utils.profiler import profiler
 import os
 
 import pygame, math
@@ -8,15 +13,26 @@ import pygame, math
 
 logger = get_logger('graphics')
 
+# Sizes used by icon labels and titlebars (12) and by Terminal text (16).
+preloaded_font_sizes = (12, 16)
+
 
 class Surface(pygame.Surface):
 	"""
 	Derives from pygame.Surface and adds ID and pos Attributes.
 
+	Every blit and fill on the Surface marks the affected area as damaged, so the compositor only has to redraw those regions.
+	Drawing done behind pygame's back (pygame.draw etc.) has to be reported with damage().
+
 	Attributes:
 		ID - ID of the Surface.
 		pos - Position of the Surface on the main display surface.
+		damaged - Rects of the Surface (in its own coordinates) changed since the last frame.
 	"""
+
+	# Past this many separate rects, the damage is collapsed into their union.
+	max_damaged_rects = 16
+
 	def __init__(self, size, pos):
 		"""
 		Parameters:
@@ -24,10 +40,83 @@ class Surface(pygame.Surface):
 		"""
 		super().__init__(size, pygame.SRCALPHA)
 		self.ID = f'SURFACE-{id_generator.generate_id()}'
-		self.pos = pos
+		self._pos = pos
+		self.damaged = [self.get_rect()]
+		self.vacated = []
 
 		logger.debug(f'Initialized Surface with ID {self.ID} and size ({size[0]}, {size[1]}).')
 
+	def copy(self):
+		# pygame builds the copy without calling __init__, so the copy needs its own ID and damage tracking.
+		surface = super().copy()
+		surface.ID = f'SURFACE-{id_generator.generate_id()}'
+		surface._pos = self._pos
+		surface.damaged = [surface.get_rect()]
+		surface.vacated = []
+		return surface
+
+	@property
+	def pos(self):
+		return self._pos
+
+	@pos.setter
+	def pos(self, pos):
+		if pos == self._pos: return
+		self.vacated.append(self.get_screen_rect())
+		self._pos = pos
+		self.damage()
+
+	def get_screen_rect(self):
+		"""Returns the area the Surface covers on the main display surface."""
+
+		return pygame.Rect(self._pos, self.get_size())
+
+	def damage(self, rect=None):
+		"""Marks a rect of the Surface (the whole Surface if None) as changed."""
+
+		rect = self.get_rect() if rect is None else self.get_rect().clip(rect)
+		if not rect.width or not rect.height: return
+		self.damaged.append(rect)
+		if len(self.damaged) > self.max_damaged_rects:
+			self.damaged = [self.damaged[0].unionall(self.damaged[1:])]
+
+	def take_damage(self):
+		"""Returns the damaged areas in screen coordinates, including areas the Surface moved away from, and clears them."""
+
+		rects = [rect.move(self._pos) for rect in self.damaged] + self.vacated
+		self.damaged = []
+		self.vacated = []
+		return rects
+
+	def blit(self, source, dest, area=None, special_flags=0):
+		rect = super().blit(source, dest, area, special_flags)
+		self.damage(rect)
+		return rect
+
+	def blits(self, blit_sequence, doreturn=1):
+		rects = super().blits(blit_sequence, True)
+		if rects: self.damage(rects[0].unionall(rects[1:]))
+		return rects if doreturn else None
+
+	def fill(self, color, rect=None, special_flags=0):
+		rect = super().fill(color, rect, special_flags)
+		self.damage(rect)
+		return rect
+
+
+def merge_rects(rects):
+	"""Merges overlapping rects together so no area is redrawn twice."""
+
+	merged = []
+	for rect in rects:
+		rect = rect.copy()
+		index = rect.collidelist(merged)
+		while index != -1:
+			rect.union_ip(merged.pop(index))
+			index = rect.collidelist(merged)
+		merged.append(rect)
+	return merged
+
 
 class ConnPygameGraphics(object):
 	"""This class handles the outermost layer of graphics in the Application.
@@ -57,7 +146,8 @@ class ConnPygameGraphics(object):
 		pygame.display.set_caption(self.caption)
 
 		self.fps = 30
-		self.clock = pygame.time.Clock()
+		# Seconds since the previous frame, set by whatever runs the frames.
+		self.dt = 1 / self.fps
 
 		self.fonts = {
 			'regular': 'res/fonts/SourceCodePro-Regular.ttf',
@@ -65,6 +155,10 @@ class ConnPygameGraphics(object):
 			'italic': 'res/fonts/SourceCodePro-Italic.ttf',
 			'bold-italic': 'res/fonts/SourceCodePro-BoldItalic.ttf'
 		}
+		self.font_registry = FontRegistry(self.fonts)
+		self.font_registry.preload(preloaded_font_sizes)
+		self.glyph_atlases = GlyphAtlasCache(self.font_registry)
+		self.assets = AssetCache(os.path.dirname(os.path.realpath(__file__))+'/../res')
 
 		self.escape_codes = {
 			'\u001b[0m': 'reset',
@@ -78,91 +172,122 @@ class ConnPygameGraphics(object):
 			'\u001b[37m': 'white',
 		}
 
-		self.render_queue = []
+		self.layers = LayerManager()
 
-		# self.setup()
+		# Screen rects to redraw next frame that no Surface is tracking, like areas uncovered by popped Surfaces.
+		self.damaged = []
+		self.full_redraw = True
+		# Redraw everything when the damaged area covers more than this fraction of the window.
+		self.full_redraw_ratio = 0.6
+		self.show_damage = False
+		self.overlay_rects = []
+		self.updated_rects = []
 
 		logger.info('Initialized Main Graphics API.')
 
-	# def setup(self):
-	# 	logger.info('Setting things up...')
-
-	# 	self.text_presets = {
-	# 		"blue": {
-	# 			"reg": {},
-	# 			"bold": {}
-	# 		},
-	# 		"green": {
-	# 			"reg": {},
-	# 			"bold": {}
-	# 		},
-	# 		"red": {
-	# 			"reg": {},
-	# 			"bold": {}
-	# 		},
-	# 		"cyan": {
-	# 			"reg": {},
-	# 			"bold": {}
-	# 		},
-	# 		"magenta": {
-	# 			"reg": {},
-	# 			"bold": {}
-	# 		},
-	# 		"yellow": {
-	# 			"reg": {},
-	# 			"bold": {}
-	# 		},
-	# 		"black": {
-	# 			"reg": {},
-	# 			"bold": {}
-	# 		},
-	# 		"white": {
-	# 			"reg": {},
-	# 			"bold": {}
-	# 		},
-	# 	}
-
-	# 	font_reg = pygame.font.Font(self.fonts['regular'], 1)
-	# 	font_bold = pygame.font.Font(self.fonts['bold'], 1)
-
-	# 	for color in self.text_presets:
-	# 		for i in range(128):
-	# 			char = chr(i)
-	# 			self.text_presets[color]['reg'][char] = font_reg.render(char, False, color)
-	# 			self.text_presets[color]['bold'][char] = font_bold.render(char, False, color)
-			
-	# 	logger.info('Setup complete.')
-
-	def main(self, system_id):
-		"""Called on every Iteration of the Game Loop."""
-
-		self.dt = self.clock.tick(self.fps) / 1000
-		self.win.fill(pygame.Color('black'))
-		for surface in self.render_queue:
-			if not surface.ID == system_id:	self.win.blit(surface, surface.pos)
-		# system = list(filter(lambda s: s.ID == system_id, self.render_queue))[0]
-		self.win.blit(system:=list(filter(lambda s: s.ID == system_id, self.render_queue))[0], system.pos) 
-		pygame.display.update()
-
-	def push_surface(self, surface):
-		"""Push a surface to the queue."""
-
-		self.render_queue.append(surface)
-		logger.debug(f'Pushed Surface with ID {surface.ID} to the Render Queue.')
+	def main(self):
+		"""Renders and presents a frame."""
+
+		self.render()
+		self.present()
+
+	def render(self):
+		"""Redraws the damaged parts of the window. They are only shown once the frame is presented."""
+
+		with profiler.measure('Compositor', 'render'):
+			self._render()
+
+	def _render(self):
+		screen = self.win.get_rect()
+		damaged = self.damaged
+		self.damaged = []
+		for surface in self.layers:
+			damaged += surface.take_damage()
+		damaged = [rect.clip(screen) for rect in damaged]
+		damaged = merge_rects([rect for rect in damaged if rect.width and rect.height])
+
+		if self.full_redraw or sum(rect.width * rect.height for rect in damaged) > screen.width * screen.height * self.full_redraw_ratio:
+			damaged = [screen]
+			self.full_redraw = False
+
+		# The previous debug overlay gets redrawn over, but is not damage worth showing itself.
+		redraw = merge_rects(damaged + self.overlay_rects) if self.overlay_rects else damaged
+
+		for rect in redraw:
+			self.win.set_clip(rect)
+			self.win.fill(pygame.Color('black'))
+			for surface in self.layers:
+				if rect.colliderect(surface.get_screen_rect()): self.win.blit(surface, surface.pos)
+		self.win.set_clip(None)
+
+		# The overlay is drawn straight onto the window, so its rects get redrawn next frame to clear it again.
+		self.overlay_rects = []
+		self.updated_rects = redraw
+		if self.show_damage:
+			for rect in damaged:
+				# Only the edges are drawn (and cleared again), so the outline does not damage the whole rect it surrounds.
+				for edge in (pygame.Rect(rect.left, rect.top, rect.width, 1), pygame.Rect(rect.left, rect.bottom - 1, rect.width, 1), pygame.Rect(rect.left, rect.top, 1, rect.height), pygame.Rect(rect.right - 1, rect.top, 1, rect.height)):
+					self.overlay_rects.append(self.win.fill((255, 0, 255), edge))
+
+	def present(self):
+		"""Updates the parts of the display redrawn by the last render."""
+
+		with profiler.measure('Compositor', 'present'):
+			if self.updated_rects or self.overlay_rects:
+				pygame.display.update(self.updated_rects + self.overlay_rects)
+		self.updated_rects = []
+
+	def get_clipboard_text(self):
+		"""Returns the text on the clipboard, or an empty string when there is none or the clipboard is not available."""
+
+		try:
+			if not pygame.scrap.get_init(): pygame.scrap.init()
+			text = pygame.scrap.get(pygame.SCRAP_TEXT)
+		except pygame.error as e:
+			logger.warning(f'Could not read the clipboard: {e}')
+			return ''
+		if not text: return ''
+		return text.decode('utf-8', errors='replace').replace('\r\n', '\n').rstrip('\x00')
+
+	def request_full_redraw(self):
+		"""Makes the next frame redraw and update the whole window."""
+
+		self.full_redraw = True
+
+	def toggle_damage_overlay(self):
+		"""Shows or hides the outlines of the regions redrawn every frame."""
+
+		self.show_damage = not self.show_damage
+		self.full_redraw = True
+		logger.info(f'Damage overlay {"enabled" if self.show_damage else "disabled"}.')
+
+	def push_surface(self, surface, overlay=False):
+		"""Push a surface on top of the screen, or of the overlay layer if overlay is True."""
+
+		self.layers.push(surface, overlay)
+		logger.debug(f'Pushed Surface with ID {surface.ID} to the {"Overlay" if overlay else "Window"} Layer.')
 
 	def pop_surface(self, surface):
-		"""Pop a surface from the queue"""
+		"""Remove a surface from the screen."""
 
-		self.render_queue.remove(surface)
-		logger.debug(f'Poped Surface with ID {surface.ID} from the Render Queue.')
+		self.layers.remove(surface)
+		self.damaged.append(surface.get_screen_rect())
+		logger.debug(f'Poped Surface with ID {surface.ID} from the Layers.')
 
 	def select_surface(self, surface):
-		"""Puts a surface at the bottom of the queue."""
+		"""Puts a surface on top of the other windows."""
 
-		self.render_queue.remove(surface)
-		self.render_queue.append(surface)
+		self.layers.raise_surface(surface)
+		surface.damage()
 		logger.debug(f'Surface with ID {surface.ID} selected.')
 
+	def lower_surface(self, surface):
+		"""Puts a surface below the other windows."""
+
+		self.layers.lower_surface(surface)
+		surface.damage()
+		logger.debug(f'Surface with ID {surface.ID} lowered.')
+
 	# def render_text_fill(self, font_type, max_size, base_color, text, surface=None):
 	# 	"""
 	# 	Renders text filling the given Surface.
@@ -276,7 +401,7 @@ class ConnPygameGraphics(object):
 
 		surface = surface if surface else self.win
 		try:
-			font = pygame.font.Font(self.fonts[font_type], size)
+			font = self.font_registry.get(font_type, size)
 		except KeyError:
 			logger.error(f'Invalid Font Type "{font_type}". Ignoring Render Request...')
 			return
@@ -311,6 +436,29 @@ class ConnPygameGraphics(object):
 					text_rect.topleft = point
 
 		surface.blit(text, text_rect)
+
+	def render_monospace_text(self, font_type, size, text, colour, point, advance=None, surface=None):
+		"""
+		Render monospace text on a given Surface using the cached glyph atlases.
+
+		Parameters:
+			font_type - Font type (regular, bold, italic, bold-italic)
+			size - Font size
+			text - Text to render
+			colour - Color of the text
+			point - Top left point of the text
+			advance - Horizontal distance between characters. Defaults to 3/5 of the font size.
+			surface - Surface to render on
+		"""
+
+		surface = surface if surface else self.win
+		try:
+			atlas = self.glyph_atlases.get(font_type, size, colour)
+		except KeyError:
+			logger.error(f'Invalid Font Type "{font_type}". Ignoring Render Request...')
+			return
+
+		atlas.draw(surface, text, point, advance if advance else size * 3 / 5)
 	
 	def outline_surface(self, surface, colour, outline):
 		self.draw_rect(colour, 0, 0, surface.get_width(), surface.get_height(), outline, surface)
@@ -323,8 +471,14 @@ class ConnPygameGraphics(object):
 		# return mask_surf
 
 	def convert_to_pygame_image(self, path_from_res):
-		image = pygame.image.load(os.path.dirname(os.path.realpath(__file__))+'/../res'+path_from_res)
-		return image
+		"""Returns the cached image at the given path inside res. The returned image is shared and must not be drawn on."""
+
+		return self.assets.load(path_from_res)
+
+	def scaled_image(self, path_from_res, size):
+		"""Returns the cached image at the given path inside res, scaled to size. The returned image is shared and must not be drawn on."""
+
+		return self.assets.scaled(path_from_res, size)
 
 	def blit_image(self, pos, image, width=-1, height=-1, additive=True, alignment=0b1100, surface=None):
 		"""
@@ -348,7 +502,8 @@ class ConnPygameGraphics(object):
 		#TODO: Add additive and width and height stuff
 		surface = surface if surface else self.win
 		new_image_size = (width if width > 0 else image.get_width(), height if height>0 else image.get_height())
-		image = pygame.transform.scale(image, new_image_size)
+		if image.get_size() != new_image_size:
+			image = pygame.transform.scale(image, new_image_size)
 		image_rect = image.get_rect()
 
 		if alignment & 0b1100: #If both are supposed to be centered
@@ -377,6 +532,12 @@ class ConnPygameGraphics(object):
 		surface.blit(image, image_rect)
 
 
+	def report_damage(self, surface, rect):
+		"""Marks a rect drawn on a Surface by pygame.draw as damaged and returns it."""
+
+		if isinstance(surface, Surface): surface.damage(rect)
+		return rect
+
 	def draw_rect(self, color, rect_x, rect_y, rect_width, rect_height, width=0, surface=None):
 		"""
 		Draw a Rectangle on the screen.
@@ -394,7 +555,7 @@ class ConnPygameGraphics(object):
 		"""
 
 		surface = surface if surface else self.win
-		return pygame.draw.rect(surface, color, pygame.Rect(rect_x, rect_y, rect_width, rect_height), width)
+		return self.report_damage(surface, pygame.draw.rect(surface, color, pygame.Rect(rect_x, rect_y, rect_width, rect_height), width))
 
 	def draw_polygon(self, color, points, width=0, surface=None):
 		"""
@@ -410,7 +571,7 @@ class ConnPygameGraphics(object):
 		"""
 
 		surface = surface if surface else self.win
-		return pygame.draw.polygon(surface, color, points, width)
+		return self.report_damage(surface, pygame.draw.polygon(surface, color, points, width))
 
 	def draw_circle(self, color, center, radius, quadrants, width=0, surface=None):
 		"""
@@ -432,7 +593,7 @@ class ConnPygameGraphics(object):
 
 		surface = surface if surface else self.win
 		bool_quads = [bool(quadrants & 0b1000), bool(quadrants & 0b100), bool(quadrants & 0b10), bool(quadrants & 0b1)]
-		return pygame.draw.circle(surface, color, center, radius, width, *bool_quads)
+		return self.report_damage(surface, pygame.draw.circle(surface, color, center, radius, width, *bool_quads))
 
 	def draw_ellipse(self, color, rect_x, rect_y, rect_width, rect_height, width=0, surface=None):
 		"""
@@ -451,7 +612,7 @@ class ConnPygameGraphics(object):
 		"""
 
 		surface = surface if surface else self.win
-		return pygame.draw.ellipse(surface, color, pygame.Rect(rect_x, rect_y, rect_width, rect_height), width)
+		return self.report_damage(surface, pygame.draw.ellipse(surface, color, pygame.Rect(rect_x, rect_y, rect_width, rect_height), width))
 
 	def draw_arc(self, color, rect_x, rect_y, rect_width, rect_height, start_angle, stop_angle, width=1, surface=None):
 		"""
@@ -472,7 +633,7 @@ class ConnPygameGraphics(object):
 		"""
 
 		surface = surface if surface else self.win
-		return pygame.draw.arc(surface, color, pygame.Rect(rect_x, rect_y, rect_width, rect_height), math.radians(start_angle), math.radians(stop_angle) , width)
+		return self.report_damage(surface, pygame.draw.arc(surface, color, pygame.Rect(rect_x, rect_y, rect_width, rect_height), math.radians(start_angle), math.radians(stop_angle) , width))
 
 	def draw_line(self, color, start_pos, end_pos, width=1, surface=None):
 		"""
@@ -489,7 +650,7 @@ class ConnPygameGraphics(object):
 		"""
 
 		surface = surface if surface else self.win
-		return pygame.draw.line(surface, color, start_pos, end_pos, width)
+		return self.report_damage(surface, pygame.draw.line(surface, color, start_pos, end_pos, width))
 
 	def draw_lines(self, color, closed, points, width=1, surface=None):
 		"""
@@ -506,4 +667,4 @@ class ConnPygameGraphics(object):
 		"""
 
 		surface = surface if surface else self.win
-		return pygame.draw.lines(surface, color, closed, points, width)
+		return self.report_damage(surface, pygame.draw.lines(surface, color, closed, points, width))
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from custom_logging.logging import get_logger
+
+import pygame
+
+
+logger = get_logger('graphics')
+
+
+class FontRegistry(object):
+	"""Keeps loaded pygame Font objects around so they are not rebuilt from disk on every render.
+
+	Fonts are keyed by (font_type, size) and evicted least recently used first once capacity is reached.
+
+	Attributes:
+		fonts -- Dictionary mapping font types to the path of their TTF file.
+		capacity -- Maximum number of Font objects kept loaded.
+		hits -- Number of lookups served from the registry.
+		misses -- Number of lookups that had to load the font from disk.
+	"""
+
+	def __init__(self, fonts, capacity=32):
+		"""
+		Parameters:
+			fonts -- Dictionary mapping font types to the path of their TTF file.
+			capacity -- Maximum number of Font objects kept loaded.
+		"""
+
+		self.fonts = fonts
+		self.capacity = capacity
+		self.hits = 0
+		self.misses = 0
+
+		self.loaded = OrderedDict()
+
+	def get(self, font_type, size):
+		"""Returns the Font for the given type and size, loading it if needed. Raises KeyError for unknown font types."""
+
+		key = (font_type, size)
+		font = self.loaded.get(key)
+		if font:
+			self.hits += 1
+			self.loaded.move_to_end(key)
+			return font
+
+		self.misses += 1
+		font = pygame.font.Font(self.fonts[font_type], size)
+		self.loaded[key] = font
+		if len(self.loaded) > self.capacity:
+			evicted, _ = self.loaded.popitem(last=False)
+			logger.debug(f'Evicted Font {evicted} from the Font Registry.')
+		return font
+
+	def preload(self, sizes, font_types=None):
+		"""Loads every given font type at every given size."""
+
+		for font_type in (font_types if font_types else self.fonts):
+			for size in sizes:
+				key = (font_type, size)
+				if key not in self.loaded:
+					self.loaded[key] = pygame.font.Font(self.fonts[font_type], size)
+		logger.debug(f'Preloaded {len(self.loaded)} Fonts.')
+
+	def stats(self):
+		"""Returns a dictionary with the hit/miss counters and the number of loaded fonts."""
+
+		return { 'hits': self.hits, 'misses': self.misses, 'loaded': len(self.loaded), 'capacity': self.capacity }
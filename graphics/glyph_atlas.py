@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from custom_logging.logging import get_logger
+
+import pygame
+
+
+logger = get_logger('graphics')
+
+# Printable ASCII, which covers everything the Terminal normally shows.
+atlas_characters = ''.join(chr(i) for i in range(32, 127))
+
+
+class GlyphAtlas(object):
+	"""Pre-rendered glyphs of one font face, size and colour packed into a single surface.
+
+	Attributes:
+		surface -- Surface holding every glyph side by side.
+		rects -- Dictionary mapping characters to their area on the atlas surface.
+		cell_width -- Width of a single glyph cell.
+		cell_height -- Height of a single glyph cell.
+	"""
+
+	def __init__(self, font, colour):
+		"""
+		Parameters:
+			font -- pygame Font to render the glyphs with.
+			colour -- Colour of the glyphs.
+		"""
+
+		self.font = font
+		self.colour = colour
+
+		glyphs = [font.render(char, True, colour) for char in atlas_characters]
+		self.cell_width = max(glyph.get_width() for glyph in glyphs)
+		self.cell_height = max(glyph.get_height() for glyph in glyphs)
+
+		self.surface = pygame.Surface((self.cell_width * len(glyphs), self.cell_height), pygame.SRCALPHA)
+		self.surface.fill((0, 0, 0, 0))
+		self.rects = {}
+		for index, (char, glyph) in enumerate(zip(atlas_characters, glyphs)):
+			rect = pygame.Rect(index * self.cell_width, 0, glyph.get_width(), glyph.get_height())
+			# MAX blending copies the glyph onto the cleared atlas without darkening its antialiased edges.
+			self.surface.blit(glyph, rect, special_flags=pygame.BLEND_RGBA_MAX)
+			self.rects[char] = rect
+
+		# Characters outside the atlas are rendered once on first use and kept as separate surfaces.
+		self.extra = {}
+
+	def draw(self, surface, text, point, advance):
+		"""
+		Draws text on a surface using the atlas, one cell per character.
+
+		Parameters:
+			surface -- Surface to draw on.
+			text -- Text to draw.
+			point -- Top left point of the first character.
+			advance -- Horizontal distance between two characters.
+		"""
+
+		x, y = point
+		blits = []
+		for char in text:
+			if char != ' ':
+				rect = self.rects.get(char)
+				if rect:
+					blits.append((self.surface, (x, y), rect))
+				else:
+					glyph = self.extra.get(char)
+					if not glyph:
+						glyph = self.extra[char] = self.font.render(char, True, self.colour)
+					blits.append((glyph, (x, y)))
+			x += advance
+		if blits:
+			surface.blits(blits, doreturn=False)
+
+
+class GlyphAtlasCache(object):
+	"""Keeps one GlyphAtlas per (font_type, size, colour), evicting the least recently used ones.
+
+	Attributes:
+		font_registry -- FontRegistry the atlases get their fonts from.
+		capacity -- Maximum number of atlases kept around.
+	"""
+
+	def __init__(self, font_registry, capacity=64):
+		"""
+		Parameters:
+			font_registry -- FontRegistry the atlases get their fonts from.
+			capacity -- Maximum number of atlases kept around.
+		"""
+
+		self.font_registry = font_registry
+		self.capacity = capacity
+
+		self.atlases = OrderedDict()
+
+	def get(self, font_type, size, colour):
+		"""Returns the atlas for the given font type, size and colour, building it if needed. Raises KeyError for unknown font types."""
+
+		key = (font_type, size, tuple(pygame.Color(colour)))
+		atlas = self.atlases.get(key)
+		if atlas:
+			self.atlases.move_to_end(key)
+			return atlas
+
+		atlas = GlyphAtlas(self.font_registry.get(font_type, size), colour)
+		self.atlases[key] = atlas
+		if len(self.atlases) > self.capacity:
+			evicted, _ = self.atlases.popitem(last=False)
+			logger.debug(f'Evicted Glyph Atlas {evicted}.')
+		logger.debug(f'Built Glyph Atlas {key}.')
+		return atlas
@@ -0,0 +1,53 @@
+from custom_logging.logging import get_logger
+from graphics.conn_pygame_graphics import ConnPygameGraphics
+import os
+
+import pygame
+
+
+logger = get_logger('graphics')
+
+
+class HeadlessPygameGraphics(ConnPygameGraphics):
+	"""
+	Graphics API that renders into an off-screen window using SDL's dummy video driver.
+
+	Everything is rendered exactly like it is with a real window, so it can be used to run the game with no display
+	(CI, servers) and to benchmark rendering and application logic. Nothing is ever shown on screen.
+
+	Attributes:
+		frames_presented -- number of frames presented so far.
+		pixels_presented -- total area of the rects updated by all the presented frames.
+	"""
+
+	def __init__(self, width, height, caption):
+		"""
+		Parameters:
+			width -- width of the off-screen window.
+			height -- height of the off-screen window.
+			caption -- caption of the off-screen window.
+		"""
+
+		# The video driver is picked when the display is initialized, so an already running display has to go first.
+		if pygame.display.get_init() and pygame.display.get_driver() != 'dummy':
+			pygame.display.quit()
+		os.environ['SDL_VIDEODRIVER'] = 'dummy'
+		os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+		self.frames_presented = 0
+		self.pixels_presented = 0
+
+		super().__init__(width, height, caption)
+		logger.info('Running Graphics headless.')
+
+	def present(self):
+		"""Counts the frame and the area it updated. There is no display to update."""
+
+		self.frames_presented += 1
+		self.pixels_presented += sum(rect.width * rect.height for rect in self.updated_rects + self.overlay_rects)
+		self.updated_rects = []
+
+	def screenshot(self, path):
+		"""Saves the current contents of the window to an image file."""
+
+		pygame.image.save(self.win, path)
@@ -0,0 +1,78 @@
+from custom_logging.logging import get_logger
+
+
+logger = get_logger('graphics')
+
+
+class LayerManager(object):
+	"""Keeps the Surfaces on the screen indexed by ID and in an explicit z-order.
+
+	Raised Surfaces only ever go on top and lowered ones only ever go at the bottom, so the z-order is kept as two
+	insertion ordered dictionaries: the Surfaces pushed or raised, from bottom to top, and the Surfaces lowered, from
+	top to bottom. Pushing, raising, lowering and removing a Surface are all O(1) dictionary operations. Overlay
+	Surfaces (like the system outline) are kept apart from the others and are always drawn on top of them.
+
+	Attributes:
+		surfaces -- Dictionary mapping Surface IDs to Surfaces.
+		above -- Dictionary of the pushed or raised Surfaces by ID, from bottom to top.
+		below -- Dictionary of the lowered Surfaces by ID, from top to bottom. They are all under those in above.
+		overlays -- Dictionary of the overlay Surfaces by ID, from bottom to top.
+	"""
+
+	def __init__(self):
+		self.surfaces = {}
+		self.above = {}
+		self.below = {}
+		self.overlays = {}
+
+	def __iter__(self):
+		"""Iterates over every Surface from bottom to top, overlays last."""
+
+		yield from reversed(self.below.values())
+		yield from self.above.values()
+		yield from self.overlays.values()
+
+	def __len__(self):
+		return len(self.surfaces)
+
+	def __contains__(self, surface):
+		return surface.ID in self.surfaces
+
+	def get(self, surface_id):
+		"""Returns the Surface with the given ID, or None."""
+
+		return self.surfaces.get(surface_id)
+
+	def push(self, surface, overlay=False):
+		"""Adds a Surface on top of its layer."""
+
+		self.surfaces[surface.ID] = surface
+		if overlay:
+			self.overlays[surface.ID] = surface
+		else:
+			self.above[surface.ID] = surface
+
+	def remove(self, surface):
+		"""Removes a Surface from the screen."""
+
+		del self.surfaces[surface.ID]
+		for layer in (self.above, self.below, self.overlays):
+			if layer.pop(surface.ID, None) is not None: return
+
+	def raise_surface(self, surface):
+		"""Moves a Surface above every other non overlay Surface."""
+
+		if surface.ID in self.overlays: return
+		self._take(surface)
+		self.above[surface.ID] = surface
+
+	def lower_surface(self, surface):
+		"""Moves a Surface below every other Surface."""
+
+		if surface.ID in self.overlays: return
+		self._take(surface)
+		self.below[surface.ID] = surface
+
+	def _take(self, surface):
+		if self.above.pop(surface.ID, None) is None:
+			self.below.pop(surface.ID, None)
@@ -1,8 +1,12 @@
 import json
+import time
 import asyncio
+import argparse
+import pygame
 
 from custom_logging.logging import get_logger
 from graphics.conn_pygame_graphics import ConnPygameGraphics
+from graphics.headless_pygame_graphics import HeadlessPygameGraphics
 from game.system import System
 from game.graphics import Graphics
 from game.bootable_media import BootableMedia
@@ -18,15 +22,63 @@ def setup():
 		json.dump([], f, indent=4)
 
 
+def parse_args():
+	parser = argparse.ArgumentParser(description='Totally Not Hacknet')
+	parser.add_argument('--headless', action='store_true', help='render off-screen, with no window')
+	parser.add_argument('--frames', type=int, default=None, help='stop after this many frames')
+	parser.add_argument('--script', default=None, help='file with Terminal commands to type in, one per line')
+	parser.add_argument('--script-frames', type=int, default=5, help='frames to run after each scripted command')
+	parser.add_argument('--fps', type=int, default=30, help='target frame rate, 0 for uncapped')
+	return parser.parse_args()
+
+
+async def wait_frames(system, frames):
+	target = system.scheduler.frames + frames
+	while system.scheduler.frames < target:
+		await asyncio.sleep(0)
+
+
+async def run_script(system, commands, frames_per_command, stop=True):
+	"""Types the commands into the focused Terminal, one at a time, as if they came from the keyboard."""
+
+	# Let the applications draw their first frame before typing into them.
+	await wait_frames(system, 1)
+	for command in commands:
+		logger.info(f'Script: {command}')
+		for character in command:
+			pygame.event.post(pygame.event.Event(pygame.TEXTINPUT, text=character))
+		pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN, mod=0, unicode='\r'))
+		await wait_frames(system, frames_per_command)
+	if stop: system.scheduler.stop()
+
+
 async def main():
+	args = parse_args()
+
 	logger.info('Setting things up...')
 	setup()
 
 	logger.info('Starting Application...')
-	system = System('Xeno', 256, Graphics(ConnPygameGraphics(1280, 720, 'Totally Not Hacknet')))
+	conn = (HeadlessPygameGraphics if args.headless else ConnPygameGraphics)(1280, 720, 'Totally Not Hacknet')
+	conn.fps = args.fps
+	system = System('Xeno', 256, Graphics(conn))
 	system.bootable_media = BootableMedia()
 	await system.install_os()
-	await system.run_loops()
+
+	script = None
+	if args.script:
+		with open(args.script, 'r') as f:
+			commands = [line.rstrip('\n') for line in f if line.strip()]
+		script = asyncio.ensure_future(run_script(system, commands, args.script_frames, stop=args.frames is None))
+
+	start = time.perf_counter()
+	await system.run_loops(args.frames)
+	elapsed = time.perf_counter() - start
+	if script: script.cancel()
+
+	frames = system.scheduler.frames
+	logger.info(f'Ran {frames} frames in {elapsed:.3f}s ({elapsed / max(frames, 1) * 1000:.3f}ms per frame).')
+	pygame.quit()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,266 @@
+"""Differential tests of the incremental Text layout against the implementation it replaced.
+
+OldText keeps a copy of the Text that laid out its whole string again on every change. The incremental Text has to
+give the same processed list for any sequence of appends, deletions and replacements, with one deliberate exception:
+escape codes on wrapped lines now land at their real position, where the old layout could insert them one character
+early (and then laid out an extra empty piece for them), coloring the character before them. For lines like that only
+the characters and their positions are compared with the old layout. Every character of the new layout, with its
+color and style, is also checked against reference_characters(), which lays the string out one character at a time.
+test_wrapped_code_placement pins down the difference itself.
+"""
+
+import re
+import random
+
+import pytest
+
+from utils.text import Text, ESCAPE_PATTERN
+
+
+class OldText(object):
+    """The Text layout from before it was made incremental, reduced to what processed depends on."""
+
+    def __init__(self, string, color, style, fontsize, startingpos, ending):
+        self.string = string
+        self.starting_color = color
+        self.starting_style = style
+        self.fontsize = fontsize
+        self.startingpos = startingpos
+        self.ending = ending
+
+        self.escape_codes = {
+            'color': { '⸸{c:reset}': self.starting_color, '⸸{c:black}': (0, 0, 0), '⸸{c:red}': (255, 0, 0), '⸸{c:green}': (0, 255, 0), '⸸{c:yellow}': (255, 255, 0), '⸸{c:blue}': (0, 0, 255), '⸸{c:magenta}': (255, 0, 255), '⸸{c:cyan}': (0, 255, 255), '⸸{c:white}': (255, 255, 255) },
+
+            'style': { '⸸{s:reset}': self.starting_style, '⸸{s:regular}': 'regular', '⸸{s:bold}': 'bold', '⸸{s:italic}': 'italic', '⸸{s:bold-italic}': 'bold-italic'}
+        }
+
+        self.escape_pattern = re.compile(r'(\⸸\{(?:c|s):[a-zA-Z-]+\})')
+        self.process_string()
+
+    def update_string(self, string, new=False):
+        self.string = self.string + string if not new else string
+        self.process_string()
+
+    def process_string(self):
+        base = self.string.split('\n')
+        string = []
+
+        for s in base:
+            matches = self.escape_pattern.finditer(s)
+            s_split = self.escape_pattern.split(s)
+            codes = s_split[1::2] if len(s_split) > 1 else s_split
+
+            code_to_index = {}
+
+            while True:
+                try:
+                    item = next(matches)
+                    code_to_index[item.start(0)] = codes.pop(0)
+                except StopIteration:
+                    break
+
+            temp = ''.join(s_split[::2])
+
+            i = 1
+            while True:
+                if len(temp) > self.ending[0] * i + i - 1:
+                    temp = temp[:self.ending[0] * i + i - 1] + '\n' + temp[self.ending[0] * i + i - 1:]
+                    i += 1
+                else: break
+
+            for i in code_to_index:
+                original = i
+                altered = original + temp[:i].count('\n')
+
+                temp = temp[:altered] + code_to_index[i] + temp[altered:]
+
+            string.append(temp)
+
+        string = '\n'.join(string)
+
+        self.processed = []
+
+        color = self.starting_color
+        style = self.starting_style
+        fontsize = self.fontsize
+
+        height = fontsize
+        width = fontsize * 3 / 5
+
+        pos = self.startingpos.copy()
+
+        groups = self.escape_pattern.split(string)
+
+        strings = groups[::2]
+        codes = groups[1::2] if len(groups) > 1 else []
+
+        for string in strings:
+            if len(string) > 0:
+                splitstring = string.split('\n')
+
+                index = 0
+                for part in splitstring:
+                    self.processed.append((part, style, color, tuple(pos)))
+                    pos[0] += (len(part) * (width))
+                    if index + 1 < len(splitstring):
+                        pos[0] = self.startingpos[0]
+                        pos[1] += height
+                    index += 1
+
+            if codes:
+                code = codes.pop(0)
+                if code[2] == 'c':
+                    try: color = self.escape_codes['color'][code]
+                    except KeyError as e: pass
+                if code[2] == 's':
+                    try: style = self.escape_codes['style'][code]
+                    except KeyError as e: pass
+
+        number_of_lines = 1
+        pos = self.startingpos[1]
+        for group in self.processed:
+            if group[3][1] != pos:
+                pos = group[3][1]
+                number_of_lines += 1
+
+        push = None
+
+        index_to_start = 0
+
+        if number_of_lines > self.ending[1]:
+            count = 1
+            pos = self.startingpos[1]
+            for index, group in enumerate(self.processed):
+                if group[3][1] != pos:
+                    count += 1
+                    pos = group[3][1]
+                    if count > number_of_lines - self.ending[1]:
+                        push = number_of_lines - self.ending[1]
+                        index_to_start = index
+                        break
+
+        if not push: push = 0
+
+        truncated = self.processed[index_to_start:]
+        self.processed = [(group[0], group[1], group[2], (group[3][0], group[3][1] - (height * push))) for group in truncated]
+
+
+FONTSIZE = 10
+CODES = ['⸸{c:red}', '⸸{c:reset}', '⸸{s:bold}', '⸸{s:reset}', '⸸{c:blue}', '⸸{c:bogus}', '⸸{s:italic}']
+COLORS = {'⸸{c:red}': (255, 0, 0), '⸸{c:reset}': (1, 1, 1), '⸸{c:blue}': (0, 0, 255)}
+STYLES = {'⸸{s:bold}': 'bold', '⸸{s:reset}': 'regular', '⸸{s:italic}': 'italic'}
+
+
+def make_pair(string, width, rows):
+    old = OldText(string, (1, 1, 1), 'regular', FONTSIZE, startingpos=[3, 3], ending=[width, rows])
+    new = Text(string, (1, 1, 1), 'regular', FONTSIZE, startingpos=[3, 3], ending=[width, rows])
+    return old, new
+
+
+def random_chunk(rng):
+    """Returns a random piece of text with escape codes and newlines in it."""
+
+    pieces = []
+    for _ in range(rng.randint(0, 6)):
+        kind = rng.random()
+        if kind < 0.25: pieces.append(rng.choice(CODES))
+        elif kind < 0.45: pieces.append('\n')
+        else: pieces.append(''.join(rng.choice('abc xyz') for _ in range(rng.randint(0, 60))))
+    return ''.join(pieces)
+
+
+def wraps_with_codes(string, width):
+    """Checks if a line of string both wraps and has escape codes, the lines the layout deliberately changed for."""
+
+    return any(ESCAPE_PATTERN.search(line) and len(ESCAPE_PATTERN.sub('', line)) > width for line in string.split('\n'))
+
+
+def characters(processed):
+    """Returns every character laid out with its position, leaving out colors, styles and empty pieces."""
+
+    width = FONTSIZE * 3 / 5
+    return [(char, round(x + index * width, 6), y) for text, _, _, (x, y) in processed for index, char in enumerate(text)]
+
+
+def styled_characters(processed):
+    """Returns every character laid out with its style, color and position, leaving out empty pieces."""
+
+    width = FONTSIZE * 3 / 5
+    return [(char, style, color, round(x + index * width, 6), y) for text, style, color, (x, y) in processed for index, char in enumerate(text)]
+
+
+def reference_characters(string, width, rows):
+    """Lays string out one character at a time, in the style and color set by the escape codes before it."""
+
+    style, color = 'regular', (1, 1, 1)
+    laid_out = []
+    row = 0
+    for line in string.split('\n'):
+        column = 0
+        for piece in ESCAPE_PATTERN.split(line):
+            if ESCAPE_PATTERN.fullmatch(piece):
+                style = STYLES.get(piece, style)
+                color = COLORS.get(piece, color)
+                continue
+            for char in piece:
+                if column == width:
+                    row += 1
+                    column = 0
+                laid_out.append((char, style, color, row, column))
+                column += 1
+        row += 1
+
+    # Only the last rows rows are shown, moved up to the top.
+    push = max(0, row - rows)
+    return [(char, style, color, round(3 + column * FONTSIZE * 3 / 5, 6), 3 + (row - push) * FONTSIZE) for char, style, color, row, column in laid_out if row >= push]
+
+
+def assert_same_layout(old, new, width, rows):
+    assert old.string == new.string
+    assert styled_characters(new.processed) == reference_characters(new.string, width, rows)
+    if wraps_with_codes(new.string, width):
+        assert characters(old.processed) == characters(new.processed)
+    else:
+        assert old.processed == new.processed
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_matches_old_layout(seed):
+    rng = random.Random(seed)
+    for _ in range(150):
+        width, rows = rng.randint(3, 50), rng.randint(1, 12)
+        old, new = make_pair(random_chunk(rng), width, rows)
+        assert_same_layout(old, new, width, rows)
+
+        for _ in range(25):
+            operation = rng.random()
+            if operation < 0.7:
+                string = random_chunk(rng) if rng.random() < 0.5 else rng.choice('abc\n')
+                old.update_string(string)
+                new.update_string(string)
+            elif operation < 0.85:
+                count = rng.randint(1, 5)
+                old.string = old.string[:-count]
+                old.process_string()
+                new.delete_last(count)
+            else:
+                string = random_chunk(rng)
+                old.update_string(string, new=True)
+                new.update_string(string, new=True)
+            assert_same_layout(old, new, width, rows)
+
+
+@pytest.mark.parametrize('string', ['', 'abc', 'a\nb\n', '⸸{c:red}red⸸{c:reset} plain', 'abcdefghij', 'ab⸸{c:red}cdefghijkl⸸{c:blue}mn', 'abcde⸸{c:red}fg', '\n\n\n\n\n\n\n\n\n\n\n\n'])
+def test_matches_old_layout_exactly(string):
+    old, new = make_pair(string, 5, 4)
+    assert old.processed == new.processed
+
+
+def test_wrapped_code_placement():
+    # The old layout put the code at the end of the line before the last 'a', on an empty piece of its own.
+    old, new = make_pair('abb⸸{c:blue}bbaaba⸸{c:red}', 4, 10)
+
+    assert old.processed[-2:] == [('', 'regular', (0, 0, 255), (3, 23)), ('a', 'regular', (255, 0, 0), (3.0, 23))]
+    assert new.processed[-1] == ('a', 'regular', (0, 0, 255), (3, 23))
+    assert characters(old.processed) == characters(new.processed)
+    assert styled_characters(new.processed) == reference_characters(new.string, 4, 10)
@@ -0,0 +1,143 @@
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+
+from custom_logging.logging import get_logger
+
+
+logger = get_logger('game')
+
+
+class _Timer(object):
+    __slots__ = ('profiler', 'key', 'start', 'children')
+
+    def __init__(self, profiler, key):
+        self.profiler = profiler
+        self.key = key
+        self.children = 0
+
+    def __enter__(self):
+        self.profiler.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        elapsed = time.perf_counter() - self.start
+        profiler = self.profiler
+        profiler.stack.pop()
+        if profiler.stack: profiler.stack[-1].children += elapsed
+        profiler.samples[self.key].append(elapsed)
+        profiler.exclusive[self.key] += elapsed - self.children
+
+
+class FrameProfiler(object):
+    """
+    Times the phases of every frame per application class and keeps rolling percentiles of them.
+
+    Timers nest, so the time spent in a phase is also known without the phases it called (its exclusive time).
+    When a frame goes over its budget, the phase with the most exclusive time in it is logged as the culprit.
+    While disabled, measure() returns a shared no-op context manager, so instrumented code costs next to nothing.
+
+    Attributes:
+        enabled -- Whether timings are being collected.
+        window -- Number of samples kept per (name, phase).
+        samples -- Dictionary mapping (name, phase) to a deque of the latest inclusive timings, in seconds.
+        exclusive -- Dictionary mapping (name, phase) to its exclusive time in the current frame, in seconds.
+        overruns -- Number of frames that went over their budget.
+        warn_interval -- Minimum number of seconds between two overrun warnings.
+    """
+
+    def __init__(self, window=300, warn_interval=1):
+        self.enabled = False
+        self.window = window
+        self.warn_interval = warn_interval
+
+        self.null = nullcontext()
+        self.stack = []
+        self.reset()
+
+    def reset(self):
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.exclusive = defaultdict(float)
+        self.stack = []
+        self.overruns = 0
+        self.frame_start = None
+        self.last_warning = 0
+        self.unreported = 0
+
+    def enable(self):
+        self.enabled = True
+        logger.info('Frame Profiler enabled.')
+
+    def disable(self):
+        self.enabled = False
+        self.frame_start = None
+        self.stack = []
+        logger.info('Frame Profiler disabled.')
+
+    def measure(self, owner, phase):
+        """
+        Returns a context manager timing a phase.
+
+        Arguments:
+            owner -- Object whose class name the timing is filed under, or the name itself.
+            phase -- Name of the phase being timed.
+        """
+
+        if not self.enabled: return self.null
+        return _Timer(self, (owner if isinstance(owner, str) else owner.__class__.__name__, phase))
+
+    def begin_frame(self):
+        if not self.enabled: return
+        self.exclusive.clear()
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self, budget=0):
+        """Records the length of the frame and warns about the culprit if it went over budget (in seconds)."""
+
+        if not self.enabled or self.frame_start is None: return
+        total = time.perf_counter() - self.frame_start
+        self.samples[('Frame', 'total')].append(total)
+        self.frame_start = None
+        if not budget or total <= budget: return
+
+        self.overruns += 1
+        self.unreported += 1
+        now = time.monotonic()
+        if now - self.last_warning < self.warn_interval or not self.exclusive: return
+        (name, phase), spent = max(self.exclusive.items(), key=lambda item: item[1])
+        logger.warning(f'Frame took {total * 1000:.2f}ms, over its {budget * 1000:.2f}ms budget ({self.unreported} overruns since the last warning). Most of it was spent in {name}.{phase} ({spent * 1000:.2f}ms).')
+        self.last_warning = now
+        self.unreported = 0
+
+    @staticmethod
+    def percentile(ordered, fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def stats(self):
+        """Returns a dictionary mapping (name, phase) to the count, p50, p95, p99 and max of its timings, in seconds."""
+
+        stats = {}
+        for key, samples in list(self.samples.items()):
+            if not samples: continue
+            ordered = sorted(samples)
+            stats[key] = {
+                'count': len(ordered),
+                'p50': self.percentile(ordered, 0.5),
+                'p95': self.percentile(ordered, 0.95),
+                'p99': self.percentile(ordered, 0.99),
+                'max': ordered[-1]
+            }
+        return stats
+
+    def report(self):
+        """Returns the stats as lines of text, slowest p95 first."""
+
+        lines = ['p50 / p95 / p99 (ms)']
+        for (name, phase), stat in sorted(self.stats().items(), key=lambda item: -item[1]['p95']):
+            lines.append(f'{name}.{phase}: {stat["p50"] * 1000:.2f} / {stat["p95"] * 1000:.2f} / {stat["p99"] * 1000:.2f}')
+        if self.overruns: lines.append(f'Frames over budget: {self.overruns}')
+        return '\n'.join(lines)
+
+
+profiler = FrameProfiler()
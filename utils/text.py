@@ -1,4 +1,7 @@
 import re
+from collections import deque, namedtuple
+from functools import lru_cache
+from itertools import chain
 
 class Formatting():
     BLACK = '⸸{c:black}'
@@ -14,8 +17,56 @@ class Formatting():
     ITALIC = '⸸{s:italic}'
     BOLD_ITALIC = '⸸{s:bold-italic}'
 
+
+ESCAPE_PATTERN = re.compile(r'(\⸸\{(?:c|s):[a-zA-Z-]+\})')
+
+
+@lru_cache(maxsize=1024)
+def wrap_line(line, width):
+    """
+    Splits a logical line into the text between its escape codes and the codes, wrapping the text every width characters.
+
+    Returns (strings, codes), where codes[i] comes right after strings[i]. Wrapping inserts newlines into the strings,
+    only once more text follows, so a code right at the end of a row stays on that row. Lines are cached, since the same
+    ones (prompts, repeated output) keep coming back.
+    """
+
+    tokens = ESCAPE_PATTERN.split(line)
+    wrapped = []
+    column = 0
+
+    for string in tokens[::2]:
+        pieces = []
+        start = 0
+        while start < len(string):
+            if column and not column % width: pieces.append('\n')
+            end = min(start + width - column % width, len(string))
+            pieces.append(string[start:end])
+            column += end - start
+            start = end
+        wrapped.append(''.join(pieces))
+
+    return tuple(wrapped), tuple(tokens[1::2])
+
+
+# A laid out logical line. groups are (text, style, color, x, row) tuples, with row counted from the first row of the line.
+# color and style are the ones the line ends with.
+LineRecord = namedtuple('LineRecord', ['groups', 'rows', 'color', 'style'])
+
+
 class Text(object):
-    def __init__(self, string, color, style, fontsize, scale=1, startingpos=[0, 0], ending=[20, 10], additional_colors:dict=None):
+    """
+    Text with escape codes, wrapped and laid out into rows.
+
+    Every logical line is laid out into a LineRecord once it is complete (followed by a newline) and kept, so an append
+    only lays out the last line and whatever was appended. The rows shown are picked from the records, so scrolling
+    never lays anything out again.
+
+    With a scrollback limit, only that many complete lines are kept, in a ring buffer, and the string only holds the
+    last (incomplete) line. The text of older lines is gone, so they can not be laid out again or deleted from.
+    """
+
+    def __init__(self, string, color, style, fontsize, scale=1, startingpos=[0, 0], ending=[20, 10], additional_colors:dict=None, scrollback=None):
         
         self.string = string
         self.starting_color = color
@@ -24,6 +75,8 @@ class Text(object):
         self.scale_factor = scale
         self.startingpos = startingpos
         self.ending = ending
+        self.scrollback = scrollback
+        self.scroll = 0
         
         self.escape_codes = { 
             'color': { '⸸{c:reset}': self.starting_color, '⸸{c:black}': (0, 0, 0), '⸸{c:red}': (255, 0, 0), '⸸{c:green}': (0, 255, 0), '⸸{c:yellow}': (255, 255, 0), '⸸{c:blue}': (0, 0, 255), '⸸{c:magenta}': (255, 0, 255), '⸸{c:cyan}': (0, 255, 255), '⸸{c:white}': (255, 255, 255) },
@@ -33,77 +86,106 @@ class Text(object):
 
         if additional_colors: self.escape_codes['color'].update(additional_colors)
 
-        self.escape_pattern = re.compile(r'(\⸸\{(?:c|s):[a-zA-Z-]+\})')
         self.process_string()
 
-    def process_string(self):
-        base = self.string.split('\n')
-        string = []
-
-        for s in base:
-            matches = self.escape_pattern.finditer(s)
-            s_split = self.escape_pattern.split(s)
-            codes = s_split[1::2] if len(s_split) > 1 else s_split
-
-            code_to_index = {}
-
-            while True:
-                try:
-                    item = next(matches)
-                    code_to_index[item.start(0)] = codes.pop(0)
-                except StopIteration:
-                    break
+    @property
+    def string(self):
+        return self._string
 
-            temp = ''.join(s_split[::2])
+    @string.setter
+    def string(self, string):
+        self._string = string
+        self.committed = None
 
-            i = 1
-            while True:
-                if len(temp) > self.ending[0] * i + i - 1:
-                    temp = temp[:self.ending[0] * i + i - 1] + '\n' + temp[self.ending[0] * i + i - 1:]
-                    i += 1
-                else: break
+    def invalidate_layout(self):
+        """Makes the next process_string() lay out the whole string again. Lines already dropped from it stay as they are."""
 
-            for i in code_to_index:
-                original = i
-                altered = original + temp[:i].count('\n')
+        if not self.scrollback: self.committed = None
 
-                temp = temp[:altered] + code_to_index[i] + temp[altered:]
-
-            string.append(temp)
-
-        string = '\n'.join(string)
-        
-        self.processed = []
-
-        color = self.starting_color
-        style = self.starting_style
-        fontsize = self.get_font_size()
-
-        height = fontsize
-        width = fontsize * 3 / 5
-        
-        pos = self.startingpos.copy()
-
-        groups = self.escape_pattern.split(string)
+    def process_string(self):
+        """Lays out the lines completed since the last call and the last line, and picks the rows shown into self.processed."""
+
+        if self.committed is None:
+            self.lines = deque(maxlen=self.scrollback)
+            self.line_rows = 0
+            self.line_count = 0
+            self.committed = 0
+            self.state = (self.starting_color, self.starting_style)
+
+        lines = self._string[self.committed:].split('\n')
+        color, style = self.state
+        for line in lines[:-1]:
+            record = self.layout_line(*wrap_line(line, self.ending[0]), self.line_count > 0, False, color, style)
+            if len(self.lines) == self.lines.maxlen: self.line_rows -= self.lines[0].rows
+            self.lines.append(record)
+            self.line_rows += record.rows
+            self.line_count += 1
+            self.committed += len(line) + 1
+            color, style = record.color, record.style
+        self.state = (color, style)
+
+        if self.scrollback and self.committed:
+            self._string = self._string[self.committed:]
+            self.committed = 0
+
+        self.tail = self.layout_line(*wrap_line(lines[-1], self.ending[0]), self.line_count > 0, True, color, style)
+        self.update_processed()
+
+    def get_rows(self):
+        return self.line_rows + self.tail.rows
+
+    def get_max_scroll(self):
+        return max(0, self.get_rows() - self.ending[1])
+
+    def scroll_by(self, rows):
+        """Scrolls back (positive) or forward (negative) through the rows, without laying anything out again."""
+
+        self.scroll = min(max(self.scroll + rows, 0), self.get_max_scroll())
+        self.update_processed()
+
+    def update_processed(self):
+        height = self.get_font_size()
+        self.scroll = min(self.scroll, self.get_max_scroll())
+        first = self.get_max_scroll() - self.scroll
+        last = first + self.ending[1]
+
+        visible = []
+        end = self.get_rows()
+        for record in chain((self.tail,), reversed(self.lines)):
+            start = end - record.rows
+            if start < last:
+                visible.append([(text, style, color, (x, self.startingpos[1] + (start + row - first) * height)) for text, style, color, x, row in record.groups if first <= start + row < last])
+            if start <= first: break
+            end = start
+
+        self.processed = [group for groups in reversed(visible) for group in groups]
+
+    def layout_line(self, strings, codes, after_newline, last, color, style):
+        """
+        Lays out a logical line, split up by wrap_line(), into a LineRecord.
+
+        The newline joining two lines sits in the same piece of text as the end of the first line and the start of the
+        next one, so those pieces are laid out even when they are empty. Any other piece is skipped when empty.
+        """
+
+        width = self.get_font_size() * 3 / 5
+        laid_out = []
+        x = self.startingpos[0]
+        row = 0
+
+        for index, string in enumerate(strings):
+            if len(string) > 0 or (index == 0 and after_newline) or (index + 1 == len(strings) and not last):
+                splitstring = string.split('\n')
 
-        strings = groups[::2]
-        codes = groups[1::2] if len(groups) > 1 else []
+                for part_index, part in enumerate(splitstring):
+                    laid_out.append((part, style, color, x, row))
+                    x += (len(part) * (width))
+                    if part_index + 1 < len(splitstring):
+                        x = self.startingpos[0]
+                        row += 1
 
-        for string in strings:
-            if len(string) > 0:
-                splitstring = string.split('\n')
-                
-                index = 0
-                for part in splitstring:
-                    self.processed.append((part, style, color, tuple(pos)))
-                    pos[0] += (len(part) * (width))
-                    if index + 1 < len(splitstring): 
-                        pos[0] = self.startingpos[0]
-                        pos[1] += height
-                    index += 1
-                    
-            if codes: 
-                code = codes.pop(0)
+            if index < len(codes):
+                code = codes[index]
                 if code[2] == 'c':
                     try: color = self.escape_codes['color'][code]
                     except KeyError as e: pass
@@ -111,33 +193,7 @@ class Text(object):
                     try: style = self.escape_codes['style'][code]
                     except KeyError as e: pass
 
-        number_of_lines = 1
-        pos = self.startingpos[1]
-        for group in self.processed:
-            if group[3][1] != pos:
-                pos = group[3][1]
-                number_of_lines += 1
-
-        push = None
-
-        index_to_start = 0
-
-        if number_of_lines > self.ending[1]:
-            count = 1
-            pos = self.startingpos[1]
-            for index, group in enumerate(self.processed):
-                if group[3][1] != pos:
-                    count += 1
-                    pos = group[3][1]
-                    if count > number_of_lines - self.ending[1]:
-                        push = number_of_lines - self.ending[1]
-                        index_to_start = index
-                        break
-
-        if not push: push = 0
-
-        truncated = self.processed[index_to_start:]
-        self.processed = [(group[0], group[1], group[2], (group[3][0], group[3][1] - (height * push))) for group in truncated]
+        return LineRecord(tuple(laid_out), row + 1, color, style)
 
     def get_raw_text(self):
         filtered = re.split(r'⸸{[a-zA-Z0-9]+}', self.string)
@@ -150,21 +206,35 @@ class Text(object):
         return int(self.fontsize * self.scale_factor)
 
     def update_string(self, string, new=False):
-        self.string = self.string + string if not new else string 
+        if new: self.string = string
+        else: self._string += string
+        self.scroll = 0
+        self.process_string()
+
+    def delete_last(self, count):
+        """Removes the last count characters of the string. With a scrollback limit, only the last line can be deleted from."""
+
+        if self.scrollback: count = min(count, len(self._string))
+        if count <= 0: return
+        self._string = self._string[:-count]
+        # Only the last line is laid out again, unless the deletion reached into a complete line.
+        if self.committed and len(self._string) < self.committed: self.invalidate_layout()
         self.process_string()
 
     def update_color(self, color):
         self.starting_color = color
         self.escape_codes['color']['⸸{color:reset}'] = self.starting_color
+        self.invalidate_layout()
 
     def update_style(self, style):
         self.starting_style = style
         self.escape_codes['style']['⸸{style:reset}'] = self.starting_style
+        self.invalidate_layout()
 
     def update_scale_factor(self, scale):
         self.scale_factor = scale
-        self.process_string
+        self.invalidate_layout()
 
     def update_starting_position(self, startpos):
         self.startingpos = startpos
-        self.process_string
+        self.invalidate_layout()